@@ -1,11 +1,12 @@
 import { TinyColor } from '@ctrl/tinycolor';
-import React, { useState, useEffect, useCallback, useMemo, useRef } from 'react';
+import React, { useState, useEffect, useMemo, useRef } from 'react';
 import { AnnotationProps, LabelType } from './types';
-import { hashToHSLColor, stringToHash } from './utils';
+import { TimeStore, useTimeSelector } from './timeStore';
+import { hashToHSLColor, stringToHash, useStableCallback } from './utils';
 
 interface LabelRendererProps {
     boxes: AnnotationProps[];
-    currentTime: number;
+    timeStore: TimeStore;
     videoDimensions: {
         naturalWidth: number;
         naturalHeight: number;
@@ -17,12 +18,70 @@ interface LabelRendererProps {
     setAndUpdateBoxes: (updatedBoxes: AnnotationProps[]) => void;
     selectedBoxId: string | null;
     setSelectedBoxId: (id: string | null) => void;
-    labelTypes: import('./types').LabelType[];
+    labelTypes: LabelType[];
 }
 
+const outlineBorder = 2;
+
+const isEventAtBottomRight = (event: React.MouseEvent<HTMLElement>) => {
+    const target = event.target as HTMLElement;
+    const rect = target.getBoundingClientRect();
+    return event.clientX >= rect.right - 10 && event.clientX <= rect.right &&
+        event.clientY >= rect.bottom - 10 && event.clientY <= rect.bottom;
+};
+
+interface BoxOverlayProps {
+    box: AnnotationProps;
+    originalIndex: number;
+    boxColor: string;
+    isSelected: boolean;
+    scaleFactorX: number;
+    scaleFactorY: number;
+    onBoxMouseDown: (event: React.MouseEvent<HTMLDivElement>, boxId: string) => void;
+}
+
+// A single box on the video. Memoized, so that only the boxes which changed are re-rendered.
+const BoxOverlay = React.memo(({
+    box,
+    originalIndex,
+    boxColor,
+    isSelected,
+    scaleFactorX,
+    scaleFactorY,
+    onBoxMouseDown,
+}: BoxOverlayProps) => {
+    const boxBg = useMemo(() => new TinyColor(boxColor).setAlpha(0.3).toString(), [boxColor]);
+    return (
+        <div
+            style={{
+                whiteSpace: 'nowrap',
+                position: 'absolute',
+                top: `${box.label.y / scaleFactorY}px`,
+                left: `${box.label.x / scaleFactorX}px`,
+                width: `${box.label.width / scaleFactorX - 2 * outlineBorder}px`,
+                height: `${box.label.height / scaleFactorY - 2 * outlineBorder}px`,
+                border: `${outlineBorder}px solid ${boxColor}`,
+                background: `${boxBg}`,
+                pointerEvents: 'auto',
+                // boxShadow params: h-offset, v-offset, blur-rad, spread-rad, color, [inset: bool = false].
+                boxShadow: isSelected ? '0 0 0 3px #1976d2, 0 0 8px 2px #1976d2' : '0 0 5px rgba(0, 0, 0, 0.1)',
+                zIndex: isSelected ? 2 : 1,
+            }}
+            onMouseDown={(event) => onBoxMouseDown(event, box.id)}
+            onMouseMove={(event) => {
+                // Event is at bottom right of the current box.
+                const isBR = isEventAtBottomRight(event);
+                event.currentTarget.style.cursor = isBR ? 'se-resize' : 'move';
+            }}
+        >
+            {originalIndex + 1}. {box.name}
+        </div>
+    );
+});
+
 const LabelRenderer: React.FC<LabelRendererProps> = ({
     boxes,
-    currentTime,
+    timeStore,
     videoDimensions,
     handleUpdateBox,
     setBoxes,
@@ -34,21 +93,38 @@ const LabelRenderer: React.FC<LabelRendererProps> = ({
     const [isDragging, setIsDragging] = useState(false);
     const scaleFactorX = videoDimensions.naturalWidth / videoDimensions.displayWidth;
     const scaleFactorY = videoDimensions.naturalHeight / videoDimensions.displayHeight;
-    const outlineBorder = 2;
 
-    const labelTypeMap = useMemo(() => {
-        const m = new Map<string, LabelType>();
+    const boxColors = useMemo(() => {
+        const labelTypeMap = new Map<string, LabelType>();
         for (const lt of labelTypes) {
-            m.set(lt.name, lt);
+            labelTypeMap.set(lt.name, lt);
+        }
+        const colors = new Map<string, string>();
+        for (const box of boxes) {
+            if (colors.has(box.name)) continue;
+            const labelType = labelTypeMap.get(box.name);
+            if (!labelType || !labelType.color) {
+                console.warn(`Color not defined for label type ${box.name}. Using default.`);
+            }
+            colors.set(box.name, labelType && labelType.color ? labelType.color : hashToHSLColor(stringToHash(box.name)));
         }
-        return m;
-    }, [labelTypes]);
+        return colors;
+    }, [boxes, labelTypes]);
 
-    const visibleBoxes = useMemo(() => {
-        return boxes
-            .map((box, originalIndex) => ({ ...box, originalIndex }))
-            .filter(box => currentTime >= box.label.start && currentTime <= box.label.end);
-    }, [boxes, currentTime]);
+    // Indices of the visible boxes, as a string so that this only re-renders when the
+    // set of visible boxes changes, and not on every time update.
+    const visibleKey = useTimeSelector(timeStore, time => {
+        const visible: number[] = [];
+        for (let i = 0; i < boxes.length; i++) {
+            if (time >= boxes[i].label.start && time <= boxes[i].label.end) {
+                visible.push(i);
+            }
+        }
+        return visible.join(',');
+    });
+    const visibleIndices = useMemo(() => {
+        return visibleKey === '' ? [] : visibleKey.split(',').map(Number);
+    }, [visibleKey]);
 
     // Ref to always have latest boxes for keyboard handler without re-registering listener
     const boxesRef = useRef<AnnotationProps[]>(boxes);
@@ -56,26 +132,23 @@ const LabelRenderer: React.FC<LabelRendererProps> = ({
         boxesRef.current = boxes;
     }, [boxes]);
 
-    const isAnnotationVisible = useCallback((ann: AnnotationProps) => {
-        return ann && currentTime >= ann.label.start && currentTime <= ann.label.end;
-    }, [currentTime]);
-
     // Keyboard shortcuts for moving/resizing selected box (uses boxesRef to avoid dependency on boxes)
     useEffect(() => {
         if (!selectedBoxId) return;
 
-        const boxIndex = boxesRef.current.findIndex(b => b.id === selectedBoxId);
-        if (boxIndex === -1) return;
-        const box = boxesRef.current[boxIndex];
-        if (!isAnnotationVisible(box)) return;
-
-
         const handleKeyDown = (event: KeyboardEvent) => {
             // // Only act if a box is selected and no input is focused
             // if (document.activeElement && (document.activeElement.tagName === 'INPUT' || document.activeElement.tagName === 'TEXTAREA' || (document.activeElement as HTMLElement).isContentEditable)) {
             //     return;
             // }
 
+            const boxIndex = boxesRef.current.findIndex(b => b.id === selectedBoxId);
+            if (boxIndex === -1) return;
+            const box = boxesRef.current[boxIndex];
+            // Only visible boxes can be moved.
+            const currentTime = timeStore.get();
+            if (currentTime < box.label.start || currentTime > box.label.end) return;
+
             let dx = 0, dy = 0, dWidth = 0, dHeight = 0;
             const moveAmount = event.ctrlKey ? 5 : 1;
 
@@ -130,25 +203,72 @@ const LabelRenderer: React.FC<LabelRendererProps> = ({
 
         window.addEventListener('keydown', handleKeyDown);
         return () => window.removeEventListener('keydown', handleKeyDown);
-    }, [selectedBoxId, setBoxes, setAndUpdateBoxes, scaleFactorX, scaleFactorY, isAnnotationVisible]);
+    }, [selectedBoxId, setAndUpdateBoxes, scaleFactorX, scaleFactorY, timeStore]);
 
-    const isEventAtBottomRight = (event: React.MouseEvent<HTMLElement>) => {
-        const target = event.target as HTMLElement;
-        const rect = target.getBoundingClientRect();
-        return event.clientX >= rect.right - 10 && event.clientX <= rect.right &&
-            event.clientY >= rect.bottom - 10 && event.clientY <= rect.bottom;
-    };
+    // Stable, so that the memoized boxes do not re-render when this re-renders.
+    const handleBoxMouseDown = useStableCallback((event: React.MouseEvent<HTMLDivElement>, boxId: string) => {
+        // Only activate on left click, ignore other clicks.
+        if (event.button !== 0) {
+            return;
+        }
+        event.preventDefault();  // Prevent default e.g. click and drag selection.
+        event.stopPropagation();
+        setIsDragging(true);
+        let box = boxes.find(b => b.id === boxId);
+        if (box) {
+            setSelectedBoxId(selectedBoxId === box.id ? null : box.id);
+
+            const startX = event.clientX;
+            const startY = event.clientY;
+            const initialX = box.label.x;
+            const initialY = box.label.y;
+            const initialWidth = box.label.width;
+            const initialHeight = box.label.height;
+
+            const isBottomRight = isEventAtBottomRight(event);
+
+            const handleMouseMove = (event: MouseEvent) => {
+                // Remove thick border while moving.
+                setSelectedBoxId(null);
+
+                const deltaX = event.clientX - startX;
+                const deltaY = event.clientY - startY;
+
+                if (isBottomRight) {
+                    let newWidth = initialWidth + deltaX * scaleFactorX;
+                    let newHeight = initialHeight + deltaY * scaleFactorY;
+                    box = { ...box!, label: { ...box!.label, width: newWidth, height: newHeight } };
+                } else {
+                    const newX = initialX + deltaX * scaleFactorX;
+                    const newY = initialY + deltaY * scaleFactorY;
+                    box = { ...box!, label: { ...box!.label, x: newX, y: newY } };
+                }
+                setBoxes(boxes.map(b => b.id === boxId ? box! : b));
+            };
+
+            const handleMouseUp = (event: MouseEvent) => {
+                setIsDragging(false);
+                document.removeEventListener('mousemove', handleMouseMove);
+                document.removeEventListener('mouseup', handleMouseUp);
+
+                // Update only if mouse moved, and not just clicked.
+                if (event.clientX !== startX || event.clientY !== startY) {
+                    handleUpdateBox(box!);
+                }
+            };
+
+            document.addEventListener('mousemove', handleMouseMove);
+            document.addEventListener('mouseup', handleMouseUp);
+        }
+    });
+
+    const selectedIndex = selectedBoxId ? visibleIndices.find(i => boxes[i].id === selectedBoxId) : undefined;
 
     return (
         <div style={{ position: 'absolute', top: 0, left: 0, width: '100%', height: '100%', pointerEvents: isDragging ? 'auto' : 'none' }}>
-            {selectedBoxId && (() => {
-                const selectedBox = boxes.find(b => b.id === selectedBoxId);
-                if (!selectedBox) return null;
-                if (!isAnnotationVisible(selectedBox)) return null;
-                // Is the box visible?
-                if (currentTime < selectedBox.label.start || currentTime > selectedBox.label.end) {
-                    return null;
-                }
+            {selectedIndex !== undefined && (() => {
+                // The selected box is visible.
+                const selectedBox = boxes[selectedIndex];
                 const tipWidth = 160;
                 const left = selectedBox.label.x / scaleFactorX;
                 const top = (selectedBox.label.y + selectedBox.label.height) / scaleFactorY + 6;
@@ -174,97 +294,20 @@ const LabelRenderer: React.FC<LabelRendererProps> = ({
                     </div>
                 );
             })()}
-            {visibleBoxes.map(box => {
-                const labelType = labelTypeMap.get(box.name);
-                if (!labelType || !labelType.color) {
-                    console.warn(`Color not defined for label type ${box.name}. Using default.`);
-                }
-                const boxColor = labelType && labelType.color ? labelType.color : hashToHSLColor(stringToHash(box.name));
-                const boxBg = new TinyColor(boxColor).setAlpha(0.3).toString();
+            {visibleIndices.map(index => {
+                const box = boxes[index];
                 return (
-                    <div
+                    <BoxOverlay
                         key={box.id}
-                        data-box-id={box.id}
-                        style={{
-                            whiteSpace: 'nowrap',
-                            position: 'absolute',
-                            top: `${box.label.y / scaleFactorY}px`,
-                            left: `${box.label.x / scaleFactorX}px`,
-                            width: `${box.label.width / scaleFactorX - 2 * outlineBorder}px`,
-                            height: `${box.label.height / scaleFactorY - 2 * outlineBorder}px`,
-                            border: `${outlineBorder}px solid ${boxColor}`,
-                            background: `${boxBg}`,
-                            pointerEvents: 'auto',
-                            // boxShadow params: h-offset, v-offset, blur-rad, spread-rad, color, [inset: bool = false].
-                            boxShadow: box.id === selectedBoxId ? '0 0 0 3px #1976d2, 0 0 8px 2px #1976d2' : '0 0 5px rgba(0, 0, 0, 0.1)',
-                            zIndex: box.id === selectedBoxId ? 2 : 1,
-                        }}
-                        onMouseDown={(event) => {
-                            // Only activate on left click, ignore other clicks.
-                            if (event.button !== 0) {
-                                return;
-                            }
-                            event.preventDefault();  // Prevent default e.g. click and drag selection.
-                            event.stopPropagation();
-                            setIsDragging(true);
-                            const boxRef = event.currentTarget;
-                            const boxId = boxRef.getAttribute('data-box-id');
-                            let box = boxes.find(b => b.id === boxId);
-                            if (box) {
-                                setSelectedBoxId(selectedBoxId === box.id ? null : box.id);
-
-                                const startX = event.clientX;
-                                const startY = event.clientY;
-                                const initialX = box.label.x;
-                                const initialY = box.label.y;
-                                const initialWidth = box.label.width;
-                                const initialHeight = box.label.height;
-
-                                const isBottomRight = isEventAtBottomRight(event);
-
-                                const handleMouseMove = (event: MouseEvent) => {
-                                    // Remove thick border while moving.
-                                    setSelectedBoxId(null);
-
-                                    const deltaX = event.clientX - startX;
-                                    const deltaY = event.clientY - startY;
-
-                                    if (isBottomRight) {
-                                        let newWidth = initialWidth + deltaX * scaleFactorX;
-                                        let newHeight = initialHeight + deltaY * scaleFactorY;
-                                        box = { ...box!, label: { ...box!.label, width: newWidth, height: newHeight } };
-                                    } else {
-                                        const newX = initialX + deltaX * scaleFactorX;
-                                        const newY = initialY + deltaY * scaleFactorY;
-                                        box = { ...box!, label: { ...box!.label, x: newX, y: newY } };
-                                    }
-                                    setBoxes(boxes.map(b => b.id === boxId ? box! : b));
-                                };
-
-                                const handleMouseUp = (event: MouseEvent) => {
-                                    setIsDragging(false);
-                                    document.removeEventListener('mousemove', handleMouseMove);
-                                    document.removeEventListener('mouseup', handleMouseUp);
-
-                                    // Update only if mouse moved, and not just clicked.
-                                    if (event.clientX !== startX || event.clientY !== startY) {
-                                        handleUpdateBox(box!);
-                                    }
-                                };
-
-                                document.addEventListener('mousemove', handleMouseMove);
-                                document.addEventListener('mouseup', handleMouseUp);
-                            }
-                        }}
-                        onMouseMove={(event) => {
-                            // Event is at bottom right of the current box.
-                            const isBR = isEventAtBottomRight(event);
-                            event.currentTarget.style.cursor = isBR ? 'se-resize' : 'move';
-                        }}
-                    >
-                        {box.originalIndex + 1}. {box.name}
-                    </div>
-                )
+                        box={box}
+                        originalIndex={index}
+                        boxColor={boxColors.get(box.name)!}
+                        isSelected={box.id === selectedBoxId}
+                        scaleFactorX={scaleFactorX}
+                        scaleFactorY={scaleFactorY}
+                        onBoxMouseDown={handleBoxMouseDown}
+                    />
+                );
             })}
         </div>
     );
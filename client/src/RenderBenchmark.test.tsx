@@ -0,0 +1,113 @@
+import React, { Profiler, ProfilerOnRenderCallback } from 'react';
+import { act, render } from '@testing-library/react';
+import LabelRenderer from './LabelRenderer';
+import Sidebar from './Sidebar';
+import { TimeStore } from './timeStore';
+import { AnnotationProps, LabelType } from './types';
+
+// Render-time benchmark of the box overlay and the sidebar with a synthetic label set.
+// Run with `npm test -- RenderBenchmark --watchAll=false`.
+// Timings are only reported, since they depend on the machine. Set
+// RENDER_BENCHMARK_STRICT=1 to also fail if a frame exceeds the 60 fps budget.
+
+const NUM_BOXES = 3000;
+// Two seconds of playback at 60 fps.
+const FPS = 60;
+const NUM_FRAMES = 120;
+
+const labelTypes: LabelType[] = [
+    { name: 'blur', allow_multiple: true, color: 'green' },
+    { name: 'object_no_1', allow_multiple: false, color: 'red' },
+];
+
+// Deterministic, so that runs are comparable.
+const makeBoxes = (n: number): AnnotationProps[] => {
+    const boxes: AnnotationProps[] = [];
+    for (let i = 0; i < n; i++) {
+        const start = (i * 7) % 3600;
+        boxes.push({
+            id: `box_${i}`,
+            name: labelTypes[i % labelTypes.length].name,
+            label: {
+                annotation_type: 'Box',
+                start,
+                end: start + 5 + (i % 20),
+                x: (i * 13) % 1800,
+                y: (i * 17) % 1000,
+                width: 100,
+                height: 80,
+            },
+        });
+    }
+    return boxes;
+};
+
+const noop = () => { };
+
+test('re-renders only what changes with thousands of boxes', () => {
+    const boxes = makeBoxes(NUM_BOXES);
+    const timeStore = new TimeStore();
+
+    let mountMs = 0;
+    let updateMs = 0;
+    let updateCommits = 0;
+    const onRender: ProfilerOnRenderCallback = (_id, phase, actualDuration) => {
+        if (phase === 'mount') {
+            mountMs += actualDuration;
+        } else {
+            updateMs += actualDuration;
+            updateCommits += 1;
+        }
+    };
+
+    const { container } = render(
+        <Profiler id="benchmark" onRender={onRender}>
+            <LabelRenderer
+                boxes={boxes}
+                timeStore={timeStore}
+                videoDimensions={{ naturalWidth: 1920, naturalHeight: 1080, displayWidth: 960, displayHeight: 540 }}
+                handleUpdateBox={noop}
+                setBoxes={noop}
+                setAndUpdateBoxes={noop}
+                selectedBoxId={null}
+                setSelectedBoxId={noop}
+                labelTypes={labelTypes}
+            />
+            <Sidebar
+                boxes={boxes}
+                labelTypes={labelTypes}
+                addBox={noop}
+                handleUpdateBox={noop}
+                handleDeleteBox={noop}
+                timeStore={timeStore}
+                selectedBoxId={null}
+                setSelectedBoxId={noop}
+                seekToTime={noop}
+                setAndUpdateBoxes={noop}
+            />
+        </Profiler>
+    );
+
+    // Simulate playback from 10:00.
+    const start = performance.now();
+    for (let frame = 1; frame <= NUM_FRAMES; frame++) {
+        act(() => {
+            timeStore.set(600 + frame / FPS);
+        });
+    }
+    const perFrameMs = (performance.now() - start) / NUM_FRAMES;
+
+    console.log(
+        `${NUM_BOXES} boxes: mount ${mountMs.toFixed(1)}ms, ` +
+        `${perFrameMs.toFixed(3)}ms per frame (wall), ` +
+        `${updateCommits} of ${NUM_FRAMES} frames re-rendered taking ${updateMs.toFixed(1)}ms in total`);
+
+    // Only the rows in view are rendered.
+    expect(container.querySelectorAll('[aria-label="Delete Box"]').length).toBeLessThan(100);
+    // Frames which do not change the visible boxes do not re-render.
+    expect(updateCommits).toBeLessThan(NUM_FRAMES / 4);
+    if (process.env.RENDER_BENCHMARK_STRICT) {
+        // Well within a 60 fps frame.
+        expect(perFrameMs).toBeLessThan(1000 / FPS);
+    }
+});
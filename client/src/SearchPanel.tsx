@@ -0,0 +1,117 @@
+import React, { useState } from 'react';
+import axios from 'axios';
+import { LabelType, SearchMatch } from './types';
+
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL
+
+const formatTime = (seconds: number): string => {
+    const minutes = Math.floor(seconds / 60);
+    const remainingSeconds = seconds % 60;
+    return `${minutes.toString().padStart(2, '0')}:${remainingSeconds.toFixed(1).padStart(4, '0')}`;
+};
+
+// Parses "ss", "mm:ss" or "hh:mm:ss" to seconds. Returns null if empty, NaN if invalid.
+const parseTime = (text: string): number | null => {
+    if (!text.trim()) return null;
+    return text.trim().split(':').reduce((total, part) => total * 60 + Number(part), 0);
+};
+
+interface SearchPanelProps {
+    labelTypes: LabelType[];
+    currentVideoUid: string | null;
+    onSelectMatch: (match: SearchMatch) => void;
+}
+
+// Searches labels across all videos, using the server's index.
+const SearchPanel: React.FC<SearchPanelProps> = ({ labelTypes, currentVideoUid, onSelectMatch }) => {
+    const [label, setLabel] = useState<string>('');
+    const [startText, setStartText] = useState<string>('');
+    const [endText, setEndText] = useState<string>('');
+    const [minWidth, setMinWidth] = useState<string>('');
+    const [minHeight, setMinHeight] = useState<string>('');
+    const [currentVideoOnly, setCurrentVideoOnly] = useState<boolean>(false);
+    // Null until the first search.
+    const [matches, setMatches] = useState<SearchMatch[] | null>(null);
+    const [truncated, setTruncated] = useState<boolean>(false);
+    const [error, setError] = useState<string | null>(null);
+    const [searching, setSearching] = useState<boolean>(false);
+
+    const handleSearch = (event: React.FormEvent) => {
+        event.preventDefault();
+        const start = parseTime(startText);
+        const end = parseTime(endText);
+        if (Number.isNaN(start) || Number.isNaN(end)) {
+            setError('Times must be in seconds, mm:ss or hh:mm:ss.');
+            return;
+        }
+        const params: Record<string, string> = {};
+        if (label) params.label = label;
+        if (start !== null) params.start = start.toString();
+        if (end !== null) params.end = end.toString();
+        if (minWidth) params.min_width = minWidth;
+        if (minHeight) params.min_height = minHeight;
+        if (currentVideoOnly && currentVideoUid) params.video = currentVideoUid;
+
+        setSearching(true);
+        setError(null);
+        axios.get(`${BACKEND_URL}/api/search`, { params }).then(response => {
+            setMatches(response.data.matches);
+            setTruncated(response.data.truncated);
+        }).catch(err => {
+            setMatches(null);
+            setTruncated(false);
+            setError(err.response?.data?.message ?? 'Search failed.');
+        }).finally(() => {
+            setSearching(false);
+        });
+    };
+
+    return (
+        <div style={{ padding: '4px 0' }}>
+            <form onSubmit={handleSearch} style={{ display: 'flex', flexWrap: 'wrap', gap: '8px', alignItems: 'center' }}>
+                <select value={label} onChange={e => setLabel(e.target.value)}>
+                    <option value=''>Any label</option>
+                    {labelTypes.map(labelType => (
+                        <option key={labelType.name} value={labelType.name}>{labelType.name}</option>
+                    ))}
+                </select>
+                <label>
+                    From <input value={startText} onChange={e => setStartText(e.target.value)} placeholder='mm:ss' style={{ width: '60px' }} />
+                </label>
+                <label>
+                    To <input value={endText} onChange={e => setEndText(e.target.value)} placeholder='mm:ss' style={{ width: '60px' }} />
+                </label>
+                <label>
+                    Min size <input type='number' min={0} value={minWidth} onChange={e => setMinWidth(e.target.value)} placeholder='w' style={{ width: '50px' }} />
+                    {' x '}
+                    <input type='number' min={0} value={minHeight} onChange={e => setMinHeight(e.target.value)} placeholder='h' style={{ width: '50px' }} />
+                </label>
+                <label>
+                    <input type='checkbox' checked={currentVideoOnly} onChange={e => setCurrentVideoOnly(e.target.checked)} />
+                    This video only
+                </label>
+                <button type='submit' disabled={searching}>{searching ? 'Searching...' : 'Search'}</button>
+            </form>
+
+            {error && <div style={{ color: 'red' }}>{error}</div>}
+            {matches?.length === 0 && <div style={{ color: 'gray' }}>No matches.</div>}
+            {matches && matches.length > 0 &&
+                <div style={{ maxHeight: '200px', overflowY: 'auto', marginTop: '4px' }}>
+                    {matches.map(match => (
+                        <div
+                            key={`${match.video_uid}/${match.box.id}`}
+                            onClick={() => onSelectMatch(match)}
+                            style={{ cursor: 'pointer', borderBottom: '1px solid #eee', padding: '2px 0' }}
+                        >
+                            {match.video_name} — {match.box.name} at {formatTime(match.box.label.start)}–{formatTime(match.box.label.end)}
+                            {' '}({Math.round(match.box.label.width)} x {Math.round(match.box.label.height)})
+                        </div>
+                    ))}
+                </div>
+            }
+            {truncated && <div style={{ color: 'gray' }}>Showing the first {matches?.length} matches. Narrow the search to see more.</div>}
+        </div>
+    );
+};
+
+export default SearchPanel;
@@ -1,14 +1,22 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useLayoutEffect, useMemo, useRef, useState } from 'react';
+import ResizeObserver from 'resize-observer-polyfill';
 import SidebarItem from './SidebarItem';
+import { TimeStore } from './timeStore';
 import { AnnotationProps, LabelType } from './types';
 
+// The list is virtualized, i.e. only the rows in view are rendered.
+// Each row has a fixed height for that.
+const ROW_HEIGHT = 34;
+// Rows rendered beyond the view on either side, to avoid flicker while scrolling.
+const OVERSCAN_ROWS = 10;
+
 interface SidebarProps {
     boxes: AnnotationProps[];
     labelTypes: LabelType[];
     addBox: () => void;
     handleUpdateBox: (updatedBox: AnnotationProps) => void;
     handleDeleteBox: (boxId: string) => void;
-    currentTime: number;
+    timeStore: TimeStore;
     selectedBoxId: string | null;
     setSelectedBoxId: React.Dispatch<React.SetStateAction<string | null>>;
     seekToTime: (time: number) => void;
@@ -21,20 +29,24 @@ const Sidebar: React.FC<SidebarProps> = ({
     addBox,
     handleUpdateBox,
     handleDeleteBox,
-    currentTime,
+    timeStore,
     selectedBoxId,
     setSelectedBoxId,
     seekToTime,
     setAndUpdateBoxes,
 }) => {
-    const [labelError, setLabelError] = useState<string>("");
+    // Only recomputed when boxes or labelTypes change, not on time updates.
+    const labelError = useMemo(() => {
+        const labelTypeMap = new Map<string, LabelType>();
+        for (const lt of labelTypes) {
+            labelTypeMap.set(lt.name, lt);
+        }
 
-    useEffect(() => {
         // Check if box intervals overlap in time with same type of label, for any labelType which should not overlap.
         const overlappingLabels: { [key: string]: { start: number; end: number; id: string }[] } = {};
 
         for (const box of boxes) {
-            const labelType = labelTypes.find(lt => lt.name === box.name);
+            const labelType = labelTypeMap.get(box.name);
             if (labelType && !labelType.allow_multiple) {
                 if (!overlappingLabels[box.name]) {
                     overlappingLabels[box.name] = [];
@@ -61,17 +73,48 @@ const Sidebar: React.FC<SidebarProps> = ({
             error = `Overlap not allowed for label types: '${overlappingLabelNames.join("', '")}'. Please edit to remove overlap.`;
         }
 
-        setLabelError(error);
+        return error;
     }, [boxes, labelTypes]);
 
+    // Track the scroll position and size of the sidebar, to find the rows in view.
+    const scrollRef = useRef<HTMLDivElement>(null);
+    const listRef = useRef<HTMLDivElement>(null);
+    const [scrollTop, setScrollTop] = useState(0);
+    const [viewHeight, setViewHeight] = useState(window.innerHeight);
+    const [listTop, setListTop] = useState(0);
+
+    useEffect(() => {
+        if (!scrollRef.current) return;
+        const observer = new ResizeObserver(() => {
+            if (scrollRef.current) {
+                setViewHeight(scrollRef.current.clientHeight);
+            }
+        });
+        observer.observe(scrollRef.current);
+        return () => observer.disconnect();
+    }, []);
+
+    // The list moves down if the error is shown above it.
+    useLayoutEffect(() => {
+        if (listRef.current) {
+            setListTop(listRef.current.offsetTop);
+        }
+    }, [labelError]);
+
+    const firstRow = Math.max(0, Math.floor((scrollTop - listTop) / ROW_HEIGHT) - OVERSCAN_ROWS);
+    const lastRow = Math.min(boxes.length, Math.ceil((scrollTop - listTop + viewHeight) / ROW_HEIGHT) + OVERSCAN_ROWS);
+
     return (
         <div
+            ref={scrollRef}
+            onScroll={event => setScrollTop(event.currentTarget.scrollTop)}
             style={{
                 width: '30%', // Sidebar takes 30% width.
                 padding: '10px 0 10px 10px',
                 borderLeft: '1px solid #ccc',
                 overflowY: 'auto',
                 maxHeight: '100vh',
+                position: 'relative',  // For offsetTop of the list.
             }}
         >
             <div
@@ -95,22 +138,29 @@ const Sidebar: React.FC<SidebarProps> = ({
                 </div>
             )}
 
-            {/* List of all the annotations. */}
-            <div style={{ display: 'grid', gridTemplateColumns: '1fr', gap: '0px', paddingRight: '2px' }}>
-                {/* Flex grid for items */}
-                {boxes.map((box, index) => (
-                    <SidebarItem
-                        index={index}
-                        key={box.id}
-                        labelTypes={labelTypes}
-                        box={box}
-                        onUpdateBox={handleUpdateBox}
-                        onDeleteBox={handleDeleteBox}
-                        currentTime={currentTime}
-                        selectedBoxId={selectedBoxId}
-                        setSelectedBoxId={setSelectedBoxId}
-                        seekToTime={seekToTime}
-                    />
+            {/* List of all the annotations. Rows out of view are replaced by padding. */}
+            <div
+                ref={listRef}
+                style={{
+                    paddingTop: firstRow * ROW_HEIGHT,
+                    paddingBottom: Math.max(0, boxes.length - lastRow) * ROW_HEIGHT,
+                    paddingRight: '2px',
+                }}
+            >
+                {boxes.slice(firstRow, lastRow).map((box, offset) => (
+                    <div key={box.id} style={{ height: ROW_HEIGHT }}>
+                        <SidebarItem
+                            index={firstRow + offset}
+                            labelTypes={labelTypes}
+                            box={box}
+                            onUpdateBox={handleUpdateBox}
+                            onDeleteBox={handleDeleteBox}
+                            timeStore={timeStore}
+                            isSelected={box.id === selectedBoxId}
+                            setSelectedBoxId={setSelectedBoxId}
+                            seekToTime={seekToTime}
+                        />
+                    </div>
                 ))}
             </div>
 
@@ -118,8 +168,9 @@ const Sidebar: React.FC<SidebarProps> = ({
             <button
                 style={{ margin: '10px 0 0 auto', display: 'block' }}
                 onClick={() => {
+                    // Sort a copy, so that the state change is detected.
                     setAndUpdateBoxes(
-                        boxes.sort((a, b) => {
+                        [...boxes].sort((a, b) => {
                             if (a.label.start === b.label.start) {
                                 // Sort by name if they start at same time.
                                 if (a.name < b.name) return -1;
@@ -1,4 +1,6 @@
+import React from 'react';
 import { AnnotationProps, LabelType } from './types';
+import { TimeStore, useTimeSelector } from './timeStore';
 
 const formatTime = (seconds: number): string => {
     const minutes = Math.floor(seconds / 60);
@@ -12,8 +14,8 @@ interface SidebarItemProps {
     box: AnnotationProps;
     onUpdateBox: (updatedBox: AnnotationProps) => void;
     onDeleteBox: (boxId: string) => void;
-    currentTime: number;
-    selectedBoxId: string | null;
+    timeStore: TimeStore;
+    isSelected: boolean;
     setSelectedBoxId: (id: string | null) => void;
     seekToTime: (time: number) => void;
 }
@@ -24,23 +26,25 @@ const SidebarItem: React.FC<SidebarItemProps> = ({
     box,
     onUpdateBox,
     onDeleteBox,
-    currentTime,
-    selectedBoxId,
+    timeStore,
+    isSelected,
     setSelectedBoxId,
     seekToTime
 }) => {
 
     const handleSetStart = () => {
+        const currentTime = timeStore.get();
         // If the start is less than end, set newEndTime to start + 1.
         const newEndTime = currentTime >= box.label.end ? currentTime + 1 : box.label.end;
         onUpdateBox({ ...box, label: { ...box.label, start: currentTime, end: newEndTime } });
     };
 
     const handleSetEnd = () => {
-        onUpdateBox({ ...box, label: { ...box.label, end: currentTime } });
+        onUpdateBox({ ...box, label: { ...box.label, end: timeStore.get() } });
     };
 
-    const isVisible = currentTime >= box.label.start && currentTime <= box.label.end;
+    // Only re-renders when the visibility changes, not on every time update.
+    const isVisible = useTimeSelector(timeStore, time => time >= box.label.start && time <= box.label.end);
 
     const handleClickSeekTime = (target: EventTarget, box: AnnotationProps) => {
         if (target instanceof HTMLButtonElement) {
@@ -48,6 +52,7 @@ const SidebarItem: React.FC<SidebarItemProps> = ({
             // Buttons already do some action, like setting the time or deleting - and they can semantically conflict with seeking.
             return;
         }
+        const currentTime = timeStore.get();
         if (currentTime < box.label.start || currentTime > box.label.end) {
             seekToTime(box.label.start);
         }
@@ -65,11 +70,11 @@ const SidebarItem: React.FC<SidebarItemProps> = ({
                 gridTemplateColumns: 'min-content 1fr 90px 90px 30px',
                 gap: '5px',
                 alignItems: 'center',
-                background: box.id === selectedBoxId ? '#e3f0ff' : undefined,
-                boxShadow: box.id === selectedBoxId ? '0 0 0 2px #1976d2' : undefined,
+                background: isSelected ? '#e3f0ff' : undefined,
+                boxShadow: isSelected ? '0 0 0 2px #1976d2' : undefined,
                 cursor: 'pointer'
             }}
-            onMouseDown={() => setSelectedBoxId(box.id === selectedBoxId ? null : box.id)}
+            onMouseDown={() => setSelectedBoxId(isSelected ? null : box.id)}
             onClick={(event) => handleClickSeekTime(event.target, box)}
         >
             {/* Index */}
@@ -115,4 +120,5 @@ const SidebarItem: React.FC<SidebarItemProps> = ({
     );
 };
 
-export default SidebarItem;
+// Memoized, so that an edit only re-renders the items which changed.
+export default React.memo(SidebarItem);
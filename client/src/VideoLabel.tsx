@@ -2,13 +2,15 @@ import React, { useState, useEffect, useRef } from 'react';
 import ResizeObserver from 'resize-observer-polyfill';
 import axios from 'axios';
 import { io, Socket } from "socket.io-client";
-import { AnnotationProps, LabelType } from './types';
+import { AnnotationProps, LabelType, RenditionInfo, SearchMatch, VideoBatchInfo, VideoMeta } from './types';
 import LabelRenderer from './LabelRenderer';
 import { useNavigate } from 'react-router';
-import { generateRandomString } from './utils'
+import { generateRandomString, useStableCallback } from './utils'
 import VideoSeekBar from './VideoSeekBar';
 import Sidebar from './Sidebar';
 import VideoSelect from './VideoSelect';
+import SearchPanel from './SearchPanel';
+import { TimeStore } from './timeStore';
 
 axios.defaults.withCredentials = true;
 
@@ -16,6 +18,13 @@ axios.defaults.withCredentials = true;
 // Backend URL. E.g. 'http://localhost:8002'.
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL
 
+// Name of the rendition which streams the source video.
+const ORIGINAL_RENDITION = 'original';
+// Remembers the preferred rendition across sessions.
+const RENDITION_STORAGE_KEY = 'preferredRendition';
+// E.g. Safari plays HLS natively. Other browsers stream the progressive proxy.
+const SUPPORTS_NATIVE_HLS = document.createElement('video').canPlayType('application/vnd.apple.mpegurl') !== '';
+
 // Function to get from backend.
 const getBackendPromise = async (endpoint: string, id?: number) => {
     return axios.get(`${BACKEND_URL}${endpoint}${id ? `/${id}` : ''}`);
@@ -46,11 +55,24 @@ const VideoPlayer: React.FC = () => {
     const [currentVideoUid, setCurrentVideoUid] = useState<string | null>(null);
     const currentVideoUidRef = useRef<string | null>(null);
     const [labelTypes, setLabelTypes] = useState<LabelType[]>([]);
-    const [currentTime, setCurrentTime] = useState<number>(0);
+    // Not a state, so that time updates do not re-render everything. See TimeStore.
+    const [timeStore] = useState(() => new TimeStore());
 
     // Thumbnail sprite URL fetched from server
     const [thumbSpriteUrl, setThumbSpriteUrl] = useState<string>("");
     const [thumbIntervalSecs, setThumbIntervalSecs] = useState<number | null>(null);
+    // Probed metadata of the current video, e.g. fps and keyframes.
+    const [videoMeta, setVideoMeta] = useState<VideoMeta | null>(null);
+    // Thumbnail info and metadata from /api/batch-info, by video uid.
+    const prefetchedInfoRef = useRef<Map<string, VideoBatchInfo>>(new Map());
+    // Lower resolution proxies available for the video with the uid.
+    const [renditionsInfo, setRenditionsInfo] = useState<{ uid: string, renditions: RenditionInfo[] } | null>(null);
+    const [preferredRendition, setPreferredRendition] = useState<string>(
+        localStorage.getItem(RENDITION_STORAGE_KEY) || ORIGINAL_RENDITION);
+    // If set, seek to this time once the video loads, e.g. after switching rendition.
+    const resumeTimeRef = useRef<number | null>(null);
+    // Search result to seek to, once its video loads.
+    const pendingMatchRef = useRef<SearchMatch | null>(null);
 
 
     useEffect(() => {
@@ -63,14 +85,108 @@ const VideoPlayer: React.FC = () => {
         if (!currentVideoUid) return;
         // Server serves further suffixes, such as .../info and .../sprite.
         setThumbSpriteUrl(`${BACKEND_URL}/api/thumbnail/${currentVideoUid}/sprite`);
-        getBackendPromise(`/api/thumbnail/${currentVideoUid}/info`).then(response => {
-            setThumbIntervalSecs(response.data.interval_secs);
+        // Thumbnail info and metadata do not change, use them right away if prefetched.
+        const prefetched = prefetchedInfoRef.current.get(currentVideoUid);
+        setThumbIntervalSecs(prefetched?.thumbnail_info?.interval_secs ?? null);
+        setVideoMeta(prefetched?.meta ?? null);
+
+        // Fetch the current video along with the next one, in one round trip.
+        const currentIndex = videoFiles.findIndex(f => f.uid === currentVideoUid);
+        const nextUid = videoFiles[currentIndex + 1]?.uid;
+        const uids = nextUid ? [currentVideoUid, nextUid] : [currentVideoUid];
+        let cancelled = false;
+        getBackendPromise(`/api/batch-info?uids=${uids.join(',')}`).then(response => {
+            if (cancelled) return;
+            const batch: Record<string, VideoBatchInfo> = response.data;
+            const info = batch[currentVideoUid];
+            setBoxes(info.labels);  // Get labeled boxes data for the current video
+            lastBackendBoxes.current = info.labels;
+            // Sent only if ready, so that the labels are not held back. Else fetched here.
+            if (info.thumbnail_info) {
+                setThumbIntervalSecs(info.thumbnail_info.interval_secs);
+            } else {
+                getBackendPromise(`/api/thumbnail/${currentVideoUid}/info`).then(response => {
+                    if (cancelled) return;
+                    setThumbIntervalSecs(response.data.interval_secs);
+                }).catch(() => {
+                    console.warn("Thumbnail info not found - is it being served?");
+                });
+            }
+            if (info.meta) {
+                setVideoMeta(info.meta);
+            } else {
+                getBackendPromise(`/api/video/${currentVideoUid}/meta`).then(response => {
+                    if (cancelled) return;
+                    setVideoMeta(response.data);
+                }).catch(() => {
+                    console.warn("Video metadata not found - frame stepping is disabled.");
+                });
+            }
+            for (const [uid, videoInfo] of Object.entries(batch)) {
+                if (videoInfo.meta) prefetchedInfoRef.current.set(uid, videoInfo);
+            }
+
+            if (nextUid) {
+                // Warm up the browser cache with the next video's sprite. The video itself
+                // is warmed up on the server, since the request above schedules a prefetch.
+                new Image().src = `${BACKEND_URL}/api/thumbnail/${nextUid}/sprite`;
+            }
+        }).catch(() => {
+            console.warn("Could not load the labels and info for the video.");
+        });
+        return () => {
+            cancelled = true;
+        };
+    }, [currentVideoUid, videoFiles]);
+
+    useEffect(() => {
+        if (!currentVideoUid) return;
+        let cancelled = false;
+        getBackendPromise(`/api/video/${currentVideoUid}/renditions`).then(response => {
+            if (cancelled) return;
+            setRenditionsInfo({ uid: currentVideoUid, renditions: response.data.renditions });
         }).catch(() => {
-            console.warn("Thumbnail info not found - is it being served?");
-            setThumbIntervalSecs(null);
+            if (cancelled) return;
+            console.warn("Renditions not found - only the original will be streamed.");
+            setRenditionsInfo({ uid: currentVideoUid, renditions: [] });
         });
+        return () => {
+            cancelled = true;
+        };
     }, [currentVideoUid]);
 
+    // Null until the renditions of the current video are known.
+    const renditions = renditionsInfo?.uid === currentVideoUid ? renditionsInfo.renditions : null;
+    // Use the preferred rendition only once it is ready.
+    const activeRendition = renditions?.some(r => r.name === preferredRendition && r.status === 'ready')
+        ? preferredRendition : ORIGINAL_RENDITION;
+    const videoSrc = (() => {
+        // Wait for the renditions, so that the original is not requested needlessly.
+        // For MKV sources, that would block on repacking the video on the server.
+        if (renditions === null) {
+            return undefined;
+        }
+        if (activeRendition === ORIGINAL_RENDITION) {
+            return `${BACKEND_URL}/api/video/${currentVideoUid}`;
+        }
+        if (SUPPORTS_NATIVE_HLS) {
+            return `${BACKEND_URL}/api/video/${currentVideoUid}/hls/${activeRendition}/index.m3u8`;
+        }
+        return `${BACKEND_URL}/api/video/${currentVideoUid}/proxy/${activeRendition}`;
+    })();
+
+    const selectRendition = (name: string) => {
+        if (playerRef.current) {
+            // Continue from the same time in the new rendition.
+            resumeTimeRef.current = playerRef.current.currentTime;
+        }
+        localStorage.setItem(RENDITION_STORAGE_KEY, name);
+        setPreferredRendition(name);
+        if (name !== activeRendition) {
+            setLoading(true);
+        }
+    };
+
     const [videoDimensions, setVideoDimensions] = useState({
         naturalWidth: 0,
         naturalHeight: 0,
@@ -163,16 +279,8 @@ const VideoPlayer: React.FC = () => {
         };
     }, []);
 
-    useEffect(() => {
-        if (!currentVideoUid) return;
-        getBackendPromise(`/api/labels/${currentVideoUid}`).then(response => {
-            setBoxes(response.data);  // Get labeled boxes data for the current video
-            lastBackendBoxes.current = response.data;
-        });
-    }, [currentVideoUid]);
-
     const handleTimeUpdate = (event: React.SyntheticEvent<HTMLVideoElement>) => {
-        setCurrentTime(event.currentTarget.currentTime);
+        timeStore.set(event.currentTarget.currentTime);
     };
 
     // High-frequency currentTime update using requestAnimationFrame
@@ -180,7 +288,7 @@ const VideoPlayer: React.FC = () => {
         let rafId: number | null = null;
         const update = () => {
             if (playerRef.current && !playerRef.current.paused && !playerRef.current.ended) {
-                setCurrentTime(playerRef.current.currentTime);
+                timeStore.set(playerRef.current.currentTime);
                 rafId = requestAnimationFrame(update);
             }
         };
@@ -225,20 +333,54 @@ const VideoPlayer: React.FC = () => {
                 }
             };
         }
-    }, [currentVideoUid]);
+    }, [currentVideoUid, timeStore]);
 
     const handleVideoLoad = (event: React.SyntheticEvent<HTMLVideoElement>) => {
         const video = event.currentTarget;
+        // Box coordinates are always in the source resolution, even when a proxy is streamed.
+        const useMetaSize = activeRendition !== ORIGINAL_RENDITION && videoMeta !== null;
         setVideoDimensions({
-            naturalWidth: video.videoWidth,
-            naturalHeight: video.videoHeight,
+            naturalWidth: useMetaSize ? videoMeta.width : video.videoWidth,
+            naturalHeight: useMetaSize ? videoMeta.height : video.videoHeight,
             displayWidth: video.clientWidth,
             displayHeight: video.clientHeight
         });
         setPlaybackRate(video.playbackRate);
         setLoading(false); // Video is ready, stop loading
+        if (resumeTimeRef.current !== null) {
+            video.currentTime = resumeTimeRef.current;
+            resumeTimeRef.current = null;
+        }
+        const pendingMatch = pendingMatchRef.current;
+        if (pendingMatch && pendingMatch.video_uid === currentVideoUid) {
+            video.currentTime = pendingMatch.box.label.start;
+            pendingMatchRef.current = null;
+        }
+    };
+
+    // Switches to the video of a search result if needed, and seeks to it.
+    const handleSelectMatch = (match: SearchMatch) => {
+        setSelectedBoxId(match.box.id);
+        if (match.video_uid === currentVideoUid) {
+            seekToTime(match.box.label.start);
+            return;
+        }
+        const index = videoFiles.findIndex(f => f.uid === match.video_uid);
+        if (index < 0) return;
+        pendingMatchRef.current = match;
+        setCurrentVideoIndex(index);
     };
 
+    // Metadata may arrive after the proxy is loaded.
+    useEffect(() => {
+        if (!videoMeta || activeRendition === ORIGINAL_RENDITION) return;
+        setVideoDimensions(prev => ({
+            ...prev,
+            naturalWidth: videoMeta.width,
+            naturalHeight: videoMeta.height,
+        }));
+    }, [videoMeta, activeRendition]);
+
     useEffect(() => {
         if (!playerRef.current) return;
 
@@ -259,7 +401,8 @@ const VideoPlayer: React.FC = () => {
     // Utility to set boxes and push to backend (throttled)
     const throttleTimeout = useRef<NodeJS.Timeout | null>(null);
     const latestBoxesRef = useRef<AnnotationProps[]>([]);
-    const setAndUpdateBoxes = (newBoxes: AnnotationProps[]) => {
+    // The handlers passed to children are stable, so that memoized children do not re-render on every change.
+    const setAndUpdateBoxes = useStableCallback((newBoxes: AnnotationProps[]) => {
         if (!enableEdit) {
             // Reset to last known boxes that were saved to, or obtained from backend.
             // I.e. revert any changes that may have been made but not saved.
@@ -290,17 +433,18 @@ const VideoPlayer: React.FC = () => {
             lastBackendBoxes.current = latestBoxesRef.current;
             throttleTimeout.current = null;
         }, 500);
-    };
+    });
 
-    const handleDeleteBox = (boxId: string) => {
+    const handleDeleteBox = useStableCallback((boxId: string) => {
         setAndUpdateBoxes(boxes.filter(box => box.id !== boxId));
-    };
+    });
 
-    const handleUpdateBox = (updatedBox: AnnotationProps) => {
+    const handleUpdateBox = useStableCallback((updatedBox: AnnotationProps) => {
         setAndUpdateBoxes(boxes.map(box => box.id === updatedBox.id ? updatedBox : box));
-    };
+    });
 
-    const addBox = () => {
+    const addBox = useStableCallback(() => {
+        const currentTime = timeStore.get();
         const newBox: AnnotationProps = {
             // Date includes milliseconds. Add a random str anyway, to make collisions practically impossible.
             id: Date.now().toString() + "_" + generateRandomString(7),
@@ -318,7 +462,7 @@ const VideoPlayer: React.FC = () => {
         };
         setAndUpdateBoxes([...boxes, newBox]);
         setSelectedBoxId(newBox.id);
-    };
+    });
 
     // Prevent window close/navigation if saving is true or a save is scheduled
     React.useEffect(() => {
@@ -338,12 +482,20 @@ const VideoPlayer: React.FC = () => {
     }, [saving]);
 
     // Seek video and update state
-    const seekToTime = (time: number) => {
+    const seekToTime = useStableCallback((time: number) => {
         if (playerRef.current) {
             setSeeking(true);
             playerRef.current.currentTime = time;
             playerRef.current.pause();
         }
+    });
+
+    // Step exactly n frames from the current frame, using the probed fps.
+    const stepFrames = (n: number) => {
+        if (!playerRef.current || !videoMeta || videoMeta.fps <= 0) return;
+        const frame = Math.floor(playerRef.current.currentTime * videoMeta.fps + 1e-3);
+        // Seek to the middle of the frame, to avoid rounding to the neighbouring frame.
+        seekToTime(Math.max(0, (frame + n + 0.5) / videoMeta.fps));
     };
 
     // Listen for seeked event to clear seeking indicator
@@ -362,12 +514,13 @@ const VideoPlayer: React.FC = () => {
     // Set loading to true when currentVideoIdx changes (new video selected)
     useEffect(() => {
         // Reset currentTime to 0 on new video load
-        setCurrentTime(0);
+        timeStore.set(0);
+        resumeTimeRef.current = null;
         // Re-enable safety.
         setEnableEdit(false);
         // Display "Loading...". Cleared on load.
         setLoading(true);
-    }, [currentVideoUid]);
+    }, [currentVideoUid, timeStore]);
 
     // Optionally, set loading to false on error (not strictly required, but for robustness)
     const handleVideoError = () => {
@@ -419,6 +572,15 @@ const VideoPlayer: React.FC = () => {
                 />
             </div>
 
+            <details>
+                <summary style={{ cursor: 'pointer' }}>Search labels in all videos</summary>
+                <SearchPanel
+                    labelTypes={labelTypes}
+                    currentVideoUid={currentVideoUid}
+                    onSelectMatch={handleSelectMatch}
+                />
+            </details>
+
             <div style={{ display: 'flex' }}> {/* Main container with flex display, added margin-top to account for fixed VideoSelect */}
                 <div style={{ width: '70%' }}>
                     {/* Video and boxes. Everything in this div must have relative positioning. */}
@@ -446,7 +608,7 @@ const VideoPlayer: React.FC = () => {
                                 onTimeUpdate={handleTimeUpdate}
                                 preload='metadata'
                                 ref={playerRef}
-                                src={`${BACKEND_URL}/api/video/${currentVideoUid}`}
+                                src={videoSrc}
                                 style={{ width: '100%', backgroundColor: 'black' }}
                             />
 
@@ -466,7 +628,7 @@ const VideoPlayer: React.FC = () => {
                             {/* Label Boxes */}
                             <LabelRenderer
                                 boxes={boxes}
-                                currentTime={currentTime}
+                                timeStore={timeStore}
                                 videoDimensions={videoDimensions}
                                 handleUpdateBox={handleUpdateBox}
                                 setBoxes={setBoxes}
@@ -480,7 +642,7 @@ const VideoPlayer: React.FC = () => {
                     {/* Video Seek Bar */}
                     <VideoSeekBar
                         duration={playerRef.current ? playerRef.current.duration : 0}
-                        currentTime={currentTime}
+                        timeStore={timeStore}
                         onSeek={(time: number) => {
                             if (playerRef.current) {
                                 playerRef.current.currentTime = time;
@@ -490,6 +652,7 @@ const VideoPlayer: React.FC = () => {
                         thumbSpriteUrl={thumbSpriteUrl}
                         thumbIntervalSecs={thumbIntervalSecs}
                         playerRef={playerRef}
+                        keyframesSec={videoMeta?.keyframes_sec}
                     />
 
                     {/* Video Seek Controls */}
@@ -497,6 +660,7 @@ const VideoPlayer: React.FC = () => {
                         <button className="media-btn" onClick={() => { seekToTime(playerRef.current!.currentTime - 1); }}>⏪ -1s</button>
                         <button className="media-btn" onClick={() => { seekToTime(playerRef.current!.currentTime - 0.5); }}>-0.5s</button>
                         <button className="media-btn" onClick={() => { seekToTime(playerRef.current!.currentTime - 0.1); }}>-0.1s</button>
+                        <button className="media-btn" disabled={!videoMeta} onClick={() => { stepFrames(-1); }}>-1f</button>
 
                         {/* Play / pause button */}
                         <button className="media-btn" style={{
@@ -515,6 +679,7 @@ const VideoPlayer: React.FC = () => {
                             {isPlaying ? '⏸️' : '▶️'}
                         </button>
 
+                        <button className="media-btn" disabled={!videoMeta} onClick={() => { stepFrames(1); }}>+1f</button>
                         <button className="media-btn" onClick={() => { seekToTime(playerRef.current!.currentTime + 0.1); }}>+0.1s</button>
                         <button className="media-btn" onClick={() => { seekToTime(playerRef.current!.currentTime + 0.5); }}>+0.5s</button>
                         <button className="media-btn" onClick={() => { seekToTime(playerRef.current!.currentTime + 1); }}>+1s ⏩</button>
@@ -544,6 +709,35 @@ const VideoPlayer: React.FC = () => {
                                 <option value={4}>4x</option>
                             </select>
                         </label>
+
+                        {/* Rendition Controls */}
+                        {renditions && renditions.length > 0 &&
+                            <label style={{ marginLeft: '16px' }}>
+                                Quality:
+                                <select
+                                    className='media-btn'
+                                    value={activeRendition}
+                                    onChange={e => selectRendition(e.target.value)}
+                                    style={{
+                                        appearance: 'none',  // Disables the down arrow.
+                                        border: '1px solid #ccc',
+                                        borderRadius: '2px',
+                                        padding: '1px 8px',
+                                        color: '#333',
+                                        outline: 'none',
+                                        marginLeft: '6px',
+                                        textAlign: 'center',
+                                    }}
+                                >
+                                    <option value={ORIGINAL_RENDITION}>Original</option>
+                                    {renditions.map(r => (
+                                        <option key={r.name} value={r.name} disabled={r.status !== 'ready'}>
+                                            {r.status === 'ready' ? r.name : `${r.name} (${r.status === 'failed' ? 'failed' : 'processing'})`}
+                                        </option>
+                                    ))}
+                                </select>
+                            </label>
+                        }
                     </div>
                 </div> {/* End of video/box wrapper */}
 
@@ -553,7 +747,7 @@ const VideoPlayer: React.FC = () => {
                     addBox={addBox}
                     handleUpdateBox={handleUpdateBox}
                     handleDeleteBox={handleDeleteBox}
-                    currentTime={currentTime}
+                    timeStore={timeStore}
                     selectedBoxId={selectedBoxId}
                     setSelectedBoxId={setSelectedBoxId}
                     seekToTime={seekToTime}
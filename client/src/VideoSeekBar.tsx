@@ -1,28 +1,34 @@
 import React, { useState, useRef } from 'react';
 import ThumbnailPreview from './ThumbnailPreview';
+import { TimeStore, useCurrentTime } from './timeStore';
+import { keyframeAtOrBefore } from './utils';
 
 const THUMBNAIL_WIDTH = 160;
 
 interface VideoSeekBarProps {
     duration: number; // total duration of the video in seconds
-    currentTime: number; // current playback time in seconds
+    timeStore: TimeStore; // current playback time in seconds
     onSeek: (time: number) => void; // callback when user seeks to a new time
     width: number; // width of the seek bar in pixels
     thumbSpriteUrl: string;
     thumbIntervalSecs: number | null;
     playerRef: React.RefObject<HTMLVideoElement | null>;
     onSeekEnd?: () => void; // called by parent after seek is complete
+    keyframesSec?: number[]; // if given, the video follows the drag at keyframes
 }
 
 const VideoSeekBar: React.FC<VideoSeekBarProps> = ({
     duration,
-    currentTime,
+    timeStore,
     onSeek,
     width,
     thumbSpriteUrl,
     thumbIntervalSecs,
     playerRef,
+    keyframesSec,
 }) => {
+    // Only the seek bar re-renders on every time update.
+    const currentTime = useCurrentTime(timeStore);
     const [isDragging, setIsDragging] = useState(false);
     // If set, will use this as position instead of the current time.
     const [dragTime, setDragTime] = useState<number | null>(null);
@@ -90,6 +96,11 @@ const VideoSeekBar: React.FC<VideoSeekBarProps> = ({
         const x = Math.min(Math.max(0, clientX - rect.left), rect.width);
         const time = (x / rect.width) * duration;
         setDragTime(time);
+        // Show the video while dragging. Keyframes are fast to seek to, the exact time
+        // is seeked on release.
+        if (keyframesSec && keyframesSec.length > 0 && playerRef.current) {
+            playerRef.current.currentTime = keyframeAtOrBefore(keyframesSec, time);
+        }
     };
 
     // Handle click on the bar to seek immediately
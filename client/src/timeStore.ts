@@ -0,0 +1,35 @@
+import { useSyncExternalStore } from 'react';
+
+// Holds the playback time outside of React state.
+// Updating it on every animation frame only re-renders the components that subscribe to it,
+// instead of the entire tree under the VideoPlayer.
+export class TimeStore {
+    private time = 0;
+    private listeners = new Set<() => void>();
+
+    get = (): number => this.time;
+
+    set = (time: number) => {
+        if (time === this.time) return;
+        this.time = time;
+        this.listeners.forEach(listener => listener());
+    };
+
+    subscribe = (listener: () => void) => {
+        this.listeners.add(listener);
+        return () => {
+            this.listeners.delete(listener);
+        };
+    };
+}
+
+// Re-renders on every time update.
+export const useCurrentTime = (store: TimeStore): number => {
+    return useSyncExternalStore(store.subscribe, store.get);
+};
+
+// Re-renders only when the selected value changes, e.g. whether a box is visible.
+// The selected value must be comparable with ===, i.e. a primitive.
+export const useTimeSelector = <T,>(store: TimeStore, selector: (time: number) => T): T => {
+    return useSyncExternalStore(store.subscribe, () => selector(store.get()));
+};
@@ -19,3 +19,38 @@ export interface LabelType {
     allow_multiple: boolean;
     color?: string;
 }
+
+// Result of /api/video/<uid>/meta.
+export interface VideoMeta {
+    duration_sec: number;
+    fps: number;
+    // Source resolution. Box coordinates are always in this resolution.
+    width: number;
+    height: number;
+    codec: string;
+    // Sorted keyframe timestamps.
+    keyframes_sec: number[];
+}
+
+// Result of /api/video/<uid>/renditions.
+export interface RenditionInfo {
+    name: string;
+    height: number;
+    // Failed renditions are not retried by the server.
+    status: "ready" | "pending" | "failed";
+}
+
+// Values of /api/batch-info, keyed by video uid.
+export interface VideoBatchInfo {
+    labels: AnnotationProps[];
+    // Null if the server has not preprocessed the video yet.
+    thumbnail_info: { interval_secs: number } | null;
+    meta: VideoMeta | null;
+}
+
+// Result of /api/search.
+export interface SearchMatch {
+    video_uid: string;
+    video_name: string;
+    box: AnnotationProps;
+}
@@ -1,3 +1,5 @@
+import { useCallback, useLayoutEffect, useRef } from 'react';
+
 export const stringToHash = (str: string): number => {
     let hash = 0;
     for (let i = 0; i < str.length; i++) {
@@ -23,4 +25,30 @@ export const generateRandomString = (length: number) => {
     result += characters.charAt(Math.floor(Math.random() * charactersLength));
   }
   return result;
-};
\ No newline at end of file
+};
+
+// Returns a callback with a stable identity, that always calls the latest fn.
+// This lets memoized children skip re-rendering when only the parent's closure changed.
+export const useStableCallback = <A extends unknown[], R>(fn: (...args: A) => R): ((...args: A) => R) => {
+  const fnRef = useRef(fn);
+  useLayoutEffect(() => {
+    fnRef.current = fn;
+  });
+  return useCallback((...args: A) => fnRef.current(...args), []);
+};
+
+// Returns the last keyframe at or before time, from sorted keyframe timestamps.
+// Seeking to a keyframe is fast, since no other frames need to be decoded.
+export const keyframeAtOrBefore = (keyframesSec: number[], time: number): number => {
+  let lo = 0;
+  let hi = keyframesSec.length;
+  while (lo < hi) {
+    const mid = (lo + hi) >> 1;
+    if (keyframesSec[mid] <= time) {
+      lo = mid + 1;
+    } else {
+      hi = mid;
+    }
+  }
+  return lo > 0 ? keyframesSec[lo - 1] : 0;
+};
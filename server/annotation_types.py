@@ -1,4 +1,7 @@
-from typing import Literal
+import os
+import shutil
+import threading
+from typing import Any, Literal
 
 import pydantic
 
@@ -31,6 +34,63 @@ class AnnotationProps(pydantic.BaseModel):
     label: BoxLabel
 
 
+# Validates or dumps a whole list of annotations in one pass.
+_ANNOTATIONS_ADAPTER = pydantic.TypeAdapter(list[AnnotationProps])
+
+
+def dump_annotations_json(annotations: list[AnnotationProps]) -> bytes:
+    return _ANNOTATIONS_ADAPTER.dump_json(annotations)
+
+
+class SetLabelsRequest(pydantic.BaseModel):
+    """Payload of api/set-labels."""
+
+    labels: list[AnnotationProps]
+    # Used by clients to ignore notifications of their own edits.
+    client_id: str = ""
+    # If set, the validated labels are echoed back. Off by default, since the client
+    # already has them.
+    return_labels: bool = False
+
+
+class SetLabelsResponse(pydantic.BaseModel):
+    status: Literal["success"] = "success"
+    labels: list[AnnotationProps] | None = None
+
+
+class VideoBatchInfo(pydantic.BaseModel):
+    """Everything the client needs to switch to a video, for api/batch-info."""
+
+    labels: list[AnnotationProps]
+    # None if not ready, e.g. keyframes not yet probed, so that the client fetches them
+    # separately instead of waiting for them.
+    thumbnail_info: dict[str, Any] | None = None
+    meta: dict[str, Any] | None = None
+
+
+# Keyed by video uid.
+_BATCH_INFO_ADAPTER = pydantic.TypeAdapter(dict[str, VideoBatchInfo])
+
+
+def dump_batch_info_json(batch: dict[str, VideoBatchInfo]) -> bytes:
+    return _BATCH_INFO_ADAPTER.dump_json(batch)
+
+
+class SearchMatch(pydantic.BaseModel):
+    video_uid: str
+    # As shown to the user, i.e. the alias or base name.
+    video_name: str
+    box: AnnotationProps
+
+
+class SearchResponse(pydantic.BaseModel):
+    """Result of api/search."""
+
+    matches: list[SearchMatch]
+    # True if there were more matches than the limit.
+    truncated: bool
+
+
 class UserAnnotation(pydantic.BaseModel):
     annotations: list[AnnotationProps]
 
@@ -45,9 +105,28 @@ class AllAnnotationsV2(pydantic.BaseModel):
 
     @classmethod
     def load(cls, v2_file: str) -> "AllAnnotationsV2":
-        with open(v2_file, "r") as f:
+        # Validates directly from bytes, without decoding to str first.
+        with open(v2_file, "rb") as f:
             return cls.model_validate_json(f.read())
 
     def save(self, v2_file: str):
-        with open(v2_file, "w") as f:
-            f.write(self.model_dump_json(indent=2))
+        # Finalized files are read only. Replacing them would bypass that.
+        if os.path.exists(v2_file) and not os.access(v2_file, os.W_OK):
+            raise PermissionError(f"Label file {v2_file} is read only.")
+        # Written to a temporary file first, so that readers never see a partial file.
+        # Unique per thread, since saves are not locked.
+        temp_file = f"{v2_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_file, "wb") as f:
+                f.write(_ALL_ANNOTATIONS_ADAPTER.dump_json(self, indent=2))
+            if os.path.exists(v2_file):
+                shutil.copymode(v2_file, temp_file)
+            os.replace(temp_file, v2_file)
+        except BaseException:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            raise
+
+
+# Dumps to bytes, without encoding from str.
+_ALL_ANNOTATIONS_ADAPTER = pydantic.TypeAdapter(AllAnnotationsV2)
@@ -0,0 +1,134 @@
+"""Micro-benchmark for serialization of labels.
+
+Compares the per-object pydantic round trips used earlier, against the single pass
+codec used by the label endpoints.
+
+Usage -
+  python -m server.benchmark_serialization
+"""
+
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Callable
+
+from . import annotation_types
+
+_NUM_BOXES = [10_000, 100_000]
+_REPEATS = 3
+
+
+def _synthetic_request(num_boxes: int) -> bytes:
+    labels = []
+    for i in range(num_boxes):
+        start = random.uniform(0, 3600)
+        labels.append(
+            {
+                "id": f"{i}_{random.randrange(10**7)}",
+                "name": random.choice(["(unknown)", "blur", "object_no_1"]),
+                "label": {
+                    "annotation_type": "Box",
+                    "start": start,
+                    "end": start + random.uniform(1, 30),
+                    "x": random.uniform(0, 1920),
+                    "y": random.uniform(0, 1080),
+                    "width": random.uniform(10, 500),
+                    "height": random.uniform(10, 500),
+                },
+            }
+        )
+    return json.dumps({"labels": labels, "client_id": "benchmark"}).encode("utf-8")
+
+
+def _save(labels: list[annotation_types.AnnotationProps], labels_file: str) -> None:
+    all_annotations = annotation_types.AllAnnotationsV2(
+        by_user={"benchmark": annotation_types.UserAnnotation(annotations=labels)}
+    )
+    all_annotations.save(labels_file)
+
+
+def _legacy_set_labels(request_data: bytes, labels_file: str) -> bytes:
+    # As flask's request.json, followed by per-label validation.
+    data = json.loads(request_data)
+    labels = [
+        annotation_types.AnnotationProps.model_validate(label)
+        for label in data["labels"]
+    ]
+    # Labels were validated again before saving.
+    labels = [
+        annotation_types.AnnotationProps.model_validate(label) for label in labels
+    ]
+    all_annotations = annotation_types.AllAnnotationsV2(
+        by_user={"benchmark": annotation_types.UserAnnotation(annotations=labels)}
+    )
+    with open(labels_file, "w") as f:
+        f.write(all_annotations.model_dump_json(indent=2))
+    # As flask's jsonify.
+    return json.dumps(
+        {"status": "success", "labels": [label.model_dump() for label in labels]}
+    ).encode("utf-8")
+
+
+def _fast_set_labels(request_data: bytes, labels_file: str) -> bytes:
+    payload = annotation_types.SetLabelsRequest.model_validate_json(request_data)
+    _save(payload.labels, labels_file)
+    return annotation_types.SetLabelsResponse().model_dump_json().encode("utf-8")
+
+
+def _legacy_get_labels(labels_file: str) -> bytes:
+    with open(labels_file, "r") as f:
+        all_annotations = annotation_types.AllAnnotationsV2.model_validate_json(
+            f.read()
+        )
+    labels = all_annotations.by_user["benchmark"].annotations
+    return json.dumps([label.model_dump() for label in labels]).encode("utf-8")
+
+
+def _fast_get_labels(labels_file: str) -> bytes:
+    all_annotations = annotation_types.AllAnnotationsV2.load(labels_file)
+    labels = all_annotations.by_user["benchmark"].annotations
+    return annotation_types.dump_annotations_json(labels)
+
+
+def _best_time_sec(fn: Callable[[], bytes]) -> float:
+    best = float("inf")
+    for _ in range(_REPEATS):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        labels_file = os.path.join(temp_dir, "labels.json")
+        print(f"{'boxes':>8} {'endpoint':>10} {'legacy':>12} {'fast':>12} {'speedup':>8}")
+        for num_boxes in _NUM_BOXES:
+            request_data = _synthetic_request(num_boxes)
+            cases: list[tuple[str, Callable[[], bytes], Callable[[], bytes]]] = [
+                (
+                    "set-labels",
+                    lambda: _legacy_set_labels(request_data, labels_file),
+                    lambda: _fast_set_labels(request_data, labels_file),
+                ),
+                (
+                    "labels",
+                    lambda: _legacy_get_labels(labels_file),
+                    lambda: _fast_get_labels(labels_file),
+                ),
+            ]
+            for name, legacy, fast in cases:
+                legacy_sec = _best_time_sec(legacy)
+                fast_sec = _best_time_sec(fast)
+                print(
+                    f"{num_boxes:>8} {name:>10}"
+                    f" {num_boxes / legacy_sec:>8.0f} b/s"
+                    f" {num_boxes / fast_sec:>8.0f} b/s"
+                    f" {legacy_sec / fast_sec:>7.1f}x"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -53,3 +53,17 @@ class VideoFileForProps(TypedDict):
     readonly: bool
     # Unique id of the video for the client
     uid: str
+
+
+class VideoMeta(TypedDict):
+    """Result of api/video/<uid>/meta for the client."""
+
+    duration_sec: float
+    # Average frame rate of the first video stream.
+    fps: float
+    # Resolution of the source video. Box coordinates are always in this resolution.
+    width: int
+    height: int
+    codec: str
+    # Times of all keyframes, sorted. Relative to the stream start, like currentTime.
+    keyframes_sec: list[float]
@@ -22,6 +22,19 @@ _CONFIG_FILE = os.getenv("ANNOTATION_CONFIG_FILE", "configuration_example.yaml")
 _CONFIG_FILE_LOCK = "/tmp/video_annotator.config.lock"
 
 
+def read_config() -> common_types.ConfigType:
+    """Reads the config file and assigns video uids, without preprocessing videos."""
+    with filelock.FileLock(_CONFIG_FILE_LOCK):
+        logging.info(f"Reading config from {os.path.abspath(_CONFIG_FILE)!r}")
+        with open(_CONFIG_FILE, "r") as f:
+            config: common_types.ConfigType = yaml.safe_load(f)
+    for video_file in config["videos"]:
+        video_file["uid"] = hashlib.sha256(
+            video_file["video_file"].encode("utf-8")
+        ).hexdigest()[:16]
+    return config
+
+
 class _ConfigDataSingleton:
     """Only one instance of this class should be used."""
 
@@ -50,22 +63,16 @@ class _ConfigDataSingleton:
         if mtime == self._last_mtime:
             return
 
-        with filelock.FileLock(_CONFIG_FILE_LOCK):
-            logging.info(f"Reading config from {os.path.abspath(_CONFIG_FILE)!r}")
-            try:
-                with open(_CONFIG_FILE, "r") as f:
-                    self._config: common_types.ConfigType = yaml.safe_load(f)
-                self._last_mtime = mtime
-            except FileNotFoundError:
-                logging.warning(f"Config file {_CONFIG_FILE!r} not found.")
-                return
+        try:
+            self._config = read_config()
+            self._last_mtime = mtime
+        except FileNotFoundError:
+            logging.warning(f"Config file {_CONFIG_FILE!r} not found.")
+            return
 
         # Preprocess thumbnails etc.
         self._videos_by_uid = {}
         for video_file in self._config["videos"]:
-            video_file["uid"] = hashlib.sha256(
-                video_file["video_file"].encode("utf-8")
-            ).hexdigest()[:16]
             self._videos_by_uid[video_file["uid"]] = video_file
             preprocess_movies.ProcessedMovie(video_file["video_file"])
         logging.info("All thumbnails ready.")
@@ -99,6 +106,12 @@ class Config:
     def get_users(self) -> list[common_types.User]:
         return self._config["users"]
 
+    def get_all_label_files(self) -> list[str]:
+        """Label files of all videos, regardless of ACL."""
+        return list(
+            dict.fromkeys(video["label_file"] for video in self._config["videos"])
+        )
+
     # This must only be called within a flask session.
     def get_current_user_videos(self) -> dict[str, common_types.VideoFileInternal]:
         result: dict[str, common_types.VideoFileInternal] = {}
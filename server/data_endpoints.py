@@ -1,6 +1,5 @@
 import logging
 import os
-import typing
 
 import flask
 from flask import jsonify
@@ -12,10 +11,17 @@ from . import annotation_types
 from . import common
 from . import common_types
 from . import config_manager
+from . import labels_cache
+from . import prefetch
+from . import preprocess_movies
+from . import search_index
 
 # Unused functions for flask endpoints.
 # pyright: reportUnusedFunction=false
 
+_DEFAULT_SEARCH_LIMIT = 200
+_MAX_SEARCH_LIMIT = 2000
+
 
 def _load_labels_all_users(
     config: config_manager.Config, video_uid: str
@@ -24,9 +30,7 @@ def _load_labels_all_users(
     # TODO: Catch KeyError and inform the client it if video_uid is no longer present.
     # This can happen if the user lost access to the video.
     labels_file = video_files[video_uid]["label_file"]
-    if not os.path.exists(labels_file):
-        return annotation_types.AllAnnotationsV2(by_user={})
-    return annotation_types.AllAnnotationsV2.load(labels_file)
+    return labels_cache.load(labels_file)
 
 
 # Simple function to get labels from a JSON file
@@ -52,26 +56,26 @@ def _save_labels(
 ):
     all_annotations = _load_labels_all_users(config, video_uid)
 
-    def dump_label(label):
-        d = label.model_dump()
-        if hasattr(label, "label") and isinstance(
-            label.label, annotation_types.BoxLabel
-        ):
-            d["label"] = label.label.model_dump_rounded()
-        return d
-
+    # The loaded annotations are shared via the cache, so make a new copy.
+    # Labels are already validated, no need to round trip them again.
     workspace = config.get_workspace(common.current_user())
-    if workspace not in all_annotations.by_user:
-        all_annotations.by_user[workspace] = annotation_types.UserAnnotation(
-            annotations=[]
-        )
-    all_annotations.by_user[workspace].annotations = [
-        annotation_types.AnnotationProps.model_validate(x) for x in labels
-    ]
+    all_annotations = annotation_types.AllAnnotationsV2.model_construct(
+        by_user={
+            **all_annotations.by_user,
+            workspace: annotation_types.UserAnnotation.model_construct(
+                annotations=labels
+            ),
+        }
+    )
 
     video_files = config.get_current_user_videos()
     labels_file = video_files[video_uid]["label_file"]
-    all_annotations.save(labels_file)
+    previous_version = labels_cache.file_version(labels_file)
+    version = labels_cache.save(labels_file, all_annotations)
+    # In the background, since this is called on every autosave.
+    search_index.SearchIndex().update_saved(
+        labels_file, previous_version, version, all_annotations, workspace
+    )
 
     # Emit a SocketIO event to notify all clients, including the client_id if provided
     try:
@@ -82,6 +86,23 @@ def _save_labels(
         logging.warning("SocketIO emit failed:", e)
 
 
+def _display_name(video: common_types.VideoFileInternal) -> str:
+    # Return video files without the path.
+    if "video_alias" in video:
+        return video["video_alias"]
+    return os.path.basename(video["video_file"])
+
+
+def _float_arg(name: str) -> float | None:
+    value = request.args.get(name)
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"Invalid {name}={value!r}, expected a number")
+
+
 def add_common_endpoints(
     app: flask.Flask,
     socketio: flask_socketio.SocketIO,
@@ -91,22 +112,19 @@ def add_common_endpoints(
     @config_manager.with_config
     def get_labels(config: config_manager.Config, video_uid: str):
         labels = _load_labels(config, video_uid)
-        return jsonify([label.model_dump() for label in labels])
+        return flask.Response(
+            annotation_types.dump_annotations_json(labels), mimetype="application/json"
+        )
 
     @app.route("/api/video-files", methods=["GET"])
     @common.login_required
     @config_manager.with_config
     def get_video_files(config: config_manager.Config):
         video_files = config.get_current_user_videos()
-        # Return video files without the path.
         file_desc: list[common_types.VideoFileForProps] = []
         for video_uid, video in video_files.items():
             file_desc.append(video.copy())
-
-            if "video_alias" in video:
-                file_desc[-1]["video_file"] = video["video_alias"]
-            else:
-                file_desc[-1]["video_file"] = os.path.basename(video["video_file"])
+            file_desc[-1]["video_file"] = _display_name(video)
 
             # Check if the label_file exists and is readonly.
             readonly = os.path.exists(video["label_file"]) and not os.access(
@@ -124,6 +142,117 @@ def add_common_endpoints(
                 file_desc[-1]["video_file"] += " (error loading labels)"
         return jsonify(file_desc)
 
+    @app.route("/api/batch-info", methods=["GET"])
+    @common.login_required
+    @config_manager.with_config
+    def get_batch_info(config: config_manager.Config):
+        # Labels, thumbnail info and metadata for comma separated uids, in one round
+        # trip. Typically the current video, followed by the next video(s).
+        video_files = config.get_current_user_videos()
+        video_uids = [
+            uid for uid in request.args.get("uids", "").split(",") if uid in video_files
+        ]
+        if not video_uids:
+            return jsonify({"status": "error", "message": "No valid uids given"}), 400
+
+        batch: dict[str, annotation_types.VideoBatchInfo] = {}
+        for index, video_uid in enumerate(video_uids):
+            video_file = video_files[video_uid]["video_file"]
+            info = annotation_types.VideoBatchInfo(
+                labels=_load_labels(config, video_uid)
+            )
+            # Only what is ready, so that the labels are never held back. The client
+            # fetches the rest separately, and other videos are left to the prefetch.
+            try:
+                if index == 0 or preprocess_movies.is_preprocessed(video_file):
+                    processed = preprocess_movies.ProcessedMovie(video_file)
+                    info.thumbnail_info = dict(processed.thumbnail_info)
+                    # Keyframes are probed from every packet, which can take a while.
+                    if preprocess_movies.has_keyframes(video_file):
+                        info.meta = dict(processed.video_meta)
+            except Exception:
+                # E.g. if probing failed. The labels are still served.
+                logging.exception(f"Could not load the info for {video_file}.")
+            batch[video_uid] = info
+
+        prefetch.prefetch_after(video_files, video_uids[0])
+        return flask.Response(
+            annotation_types.dump_batch_info_json(batch), mimetype="application/json"
+        )
+
+    @app.route("/api/search", methods=["GET"])
+    @common.login_required
+    @config_manager.with_config
+    def search(config: config_manager.Config):
+        # Searches labels across all videos of the user, in the user's workspace.
+        # Optional args -
+        #   label: Exact label name.
+        #   start, end: Seconds. Matches boxes visible at any time in between.
+        #   min_width, min_height, min_area: In pixels of the source video.
+        #   video: Only search this video uid.
+        #   limit: Maximum number of matches, up to _MAX_SEARCH_LIMIT.
+        try:
+            start_sec = _float_arg("start")
+            end_sec = _float_arg("end")
+            min_width = _float_arg("min_width") or 0.0
+            min_height = _float_arg("min_height") or 0.0
+            min_area = _float_arg("min_area") or 0.0
+            limit = int(request.args.get("limit", _DEFAULT_SEARCH_LIMIT))
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        limit = max(1, min(limit, _MAX_SEARCH_LIMIT))
+
+        video_files = config.get_current_user_videos()
+        video_uid = request.args.get("video")
+        if video_uid:
+            if video_uid not in video_files:
+                return (
+                    jsonify(
+                        {
+                            "status": "error",
+                            "message": f"Video with {video_uid=} not found",
+                        }
+                    ),
+                    404,
+                )
+            video_files = {video_uid: video_files[video_uid]}
+
+        # If several videos share a label file, matches are shown for the first one.
+        uid_by_label_file: dict[str, str] = {}
+        for uid, video in video_files.items():
+            uid_by_label_file.setdefault(video["label_file"], uid)
+        label_files = list(uid_by_label_file)
+
+        index = search_index.SearchIndex()
+        # Only stats the files, unless some were changed outside of the server.
+        index.sync(label_files)
+        results = index.search(
+            label_files,
+            workspace=config.get_workspace(common.current_user()),
+            name=request.args.get("label") or None,
+            start_sec=start_sec,
+            end_sec=end_sec,
+            min_width=min_width,
+            min_height=min_height,
+            min_area=min_area,
+            # One more, to tell if there are more matches.
+            limit=limit + 1,
+        )
+
+        # Already in the order of the user's list of videos.
+        matches = [
+            annotation_types.SearchMatch(
+                video_uid=uid_by_label_file[label_file],
+                video_name=_display_name(video_files[uid_by_label_file[label_file]]),
+                box=box,
+            )
+            for label_file, box in results[:limit]
+        ]
+        response = annotation_types.SearchResponse(
+            matches=matches, truncated=len(results) > limit
+        )
+        return flask.Response(response.model_dump_json(), mimetype="application/json")
+
     @app.route("/api/label-types", methods=["GET"])
     @common.login_required
     @config_manager.with_config
@@ -134,16 +263,24 @@ def add_common_endpoints(
     @common.login_required
     @config_manager.with_config
     def set_labels(config: config_manager.Config, video_uid: str):
-        # Expect request.json to be a dict with keys: "labels" (list) and "client_id" (str)
-        data = request.json
-        labels_data = data.get("labels", [])  # type: ignore
-        client_id = data.get("client_id", "")  # type: ignore
-        labels = [
-            annotation_types.AnnotationProps.model_validate(label)
-            for label in typing.cast(list[dict[str, str]], labels_data)
-        ]
+        # Validate the whole payload in one pass, directly from the request bytes.
+        try:
+            payload = annotation_types.SetLabelsRequest.model_validate_json(
+                request.get_data()
+            )
+        except pydantic.ValidationError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
 
-        _save_labels(config, video_uid, labels, client_id=client_id, socketio=socketio)
-        return jsonify(
-            {"status": "success", "labels": [label.model_dump() for label in labels]}
+        _save_labels(
+            config,
+            video_uid,
+            payload.labels,
+            client_id=payload.client_id,
+            socketio=socketio,
+        )
+        response = annotation_types.SetLabelsResponse(
+            labels=payload.labels if payload.return_labels else None
+        )
+        return flask.Response(
+            response.model_dump_json(exclude_none=True), mimetype="application/json"
         )
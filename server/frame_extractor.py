@@ -0,0 +1,215 @@
+import collections
+import functools
+import logging
+import math
+import os
+import subprocess
+import tempfile
+import threading
+from typing import Literal
+
+from . import preprocess_movies
+
+FrameFormat = Literal["jpeg", "webp"]
+
+MIMETYPES: dict[FrameFormat, str] = {
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+}
+
+_ENCODER_ARGS: dict[FrameFormat, list[str]] = {
+    "jpeg": ["-c:v", "mjpeg", "-q:v", "3"],
+    "webp": ["-c:v", "libwebp", "-quality", "80"],
+}
+
+# Frames decoded on either side of the requested frame, so that stepping through
+# frames is served from the cache.
+_NEIGHBOUR_FRAMES = 6
+
+# Memory bound of the decoded frame cache, across all videos.
+_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Largest output dimension allowed.
+_MAX_DIMENSION = 4096
+
+# (video_file, frame_index, width, height, format).
+_CacheKey = tuple[str, int, int, int, FrameFormat]
+
+
+class _FrameCache:
+    """Thread safe LRU cache of encoded frames, bounded by total bytes."""
+
+    def __init__(self, max_bytes: int):
+        self._max_bytes = max_bytes
+        self._total_bytes = 0
+        self._frames: collections.OrderedDict[_CacheKey, bytes] = (
+            collections.OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def get(self, key: _CacheKey) -> bytes | None:
+        with self._lock:
+            data = self._frames.get(key)
+            if data is not None:
+                self._frames.move_to_end(key)
+            return data
+
+    def put(self, key: _CacheKey, data: bytes) -> None:
+        with self._lock:
+            if key in self._frames:
+                self._total_bytes -= len(self._frames.pop(key))
+            self._frames[key] = data
+            self._total_bytes += len(data)
+            while self._total_bytes > self._max_bytes and self._frames:
+                _, evicted = self._frames.popitem(last=False)
+                self._total_bytes -= len(evicted)
+
+
+@functools.lru_cache(maxsize=None)
+def _frame_timing(video_file: str) -> tuple[float, int]:
+    """Returns fps and the number of frames, from the cached metadata."""
+    meta = preprocess_movies.ProcessedMovie(video_file).probed_meta
+    fps = float(meta["fps"])
+    if fps <= 0:
+        raise ValueError(f"Unknown frame rate for {video_file}")
+    # Absent from metadata cached by older versions, and 0 if the stream has no count.
+    num_frames = int(meta.get("num_frames", 0))
+    if not num_frames:
+        # May overshoot. If so the last decoded frame is used, see get_frame().
+        num_frames = math.floor(float(meta["duration_sec"]) * fps)
+    return fps, max(1, num_frames)
+
+
+class FrameExtractor:
+    """Decodes exact frames from videos, with a cache for neighbouring frames."""
+
+    # Singleton.
+    def __new__(cls) -> "FrameExtractor":
+        if not hasattr(cls, "_instance"):
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if hasattr(self, "_singleton_initialized"):
+            return
+        self._singleton_initialized = True
+
+        self._cache = _FrameCache(_CACHE_MAX_BYTES)
+        # One lock per video, to avoid decoding the same frames from many threads.
+        self._video_locks: collections.defaultdict[str, threading.Lock] = (
+            collections.defaultdict(threading.Lock)
+        )
+        self._video_locks_lock = threading.Lock()
+        # Frame counts found by decoding, if less than in the metadata.
+        self._decoded_num_frames: dict[str, int] = {}
+
+    def _video_lock(self, video_file: str) -> threading.Lock:
+        with self._video_locks_lock:
+            return self._video_locks[video_file]
+
+    def _num_frames(self, video_file: str) -> int:
+        _, num_frames = _frame_timing(video_file)
+        return min(num_frames, self._decoded_num_frames.get(video_file, num_frames))
+
+    def frame_index(self, video_file: str, time_sec: float) -> int:
+        """Returns the index of the frame being displayed at time_sec."""
+        fps, _ = _frame_timing(video_file)
+        num_frames = self._num_frames(video_file)
+        # Small tolerance so that a time exactly on a frame boundary is not rounded down.
+        index = math.floor(time_sec * fps + 1e-3)
+        return min(max(index, 0), num_frames - 1)
+
+    def get_frame(
+        self,
+        video_file: str,
+        frame_index: int,
+        width: int,
+        height: int,
+        fmt: FrameFormat,
+    ) -> tuple[int, bytes]:
+        """Returns the index and the encoded frame.
+
+        If the video ends before frame_index, the last frame is returned instead.
+
+        If width or height is 0, it is derived from the aspect ratio. If both are 0,
+        the source resolution is used.
+        """
+        width = min(max(width, 0), _MAX_DIMENSION)
+        height = min(max(height, 0), _MAX_DIMENSION)
+        frame_index = min(frame_index, self._num_frames(video_file) - 1)
+        key: _CacheKey = (video_file, frame_index, width, height, fmt)
+        data = self._cache.get(key)
+        if data is not None:
+            return frame_index, data
+
+        with self._video_lock(video_file):
+            # Another thread may have decoded it while we waited.
+            data = self._cache.get(key)
+            if data is None:
+                self._decode_window(video_file, frame_index, width, height, fmt)
+                data = self._cache.get(key)
+            if data is None and frame_index >= self._num_frames(video_file):
+                # The video stream ended before the frame.
+                frame_index = self._num_frames(video_file) - 1
+                data = self._cache.get((video_file, frame_index, width, height, fmt))
+        if data is None:
+            raise ValueError(f"Could not decode frame {frame_index} of {video_file}")
+        return frame_index, data
+
+    def _decode_window(
+        self,
+        video_file: str,
+        frame_index: int,
+        width: int,
+        height: int,
+        fmt: FrameFormat,
+    ) -> None:
+        """Decodes the frame and its neighbours into the cache."""
+        fps, _ = _frame_timing(video_file)
+        first = max(0, frame_index - _NEIGHBOUR_FRAMES)
+        end = min(self._num_frames(video_file), frame_index + _NEIGHBOUR_FRAMES + 1)
+        count = end - first
+
+        scale_args: list[str] = []
+        if width or height:
+            scale_args = ["-vf", f"scale={width or -2}:{height or -2}"]
+
+        extension = "jpg" if fmt == "jpeg" else fmt
+        with tempfile.TemporaryDirectory(prefix="video_annotator_frames_") as temp_dir:
+            # With -ss before -i, ffmpeg seeks to the keyframe before the time, and
+            # decodes from there, discarding frames until the exact time.
+            subprocess.check_call(
+                [
+                    "ffmpeg",
+                    "-v",
+                    "error",
+                    # Seek slightly before the frame, to avoid rounding errors.
+                    "-ss",
+                    f"{max(0.0, (first - 0.25) / fps):.6f}",
+                    "-i",
+                    video_file,
+                    "-map",
+                    "0:v:0",
+                    "-frames:v",
+                    str(count),
+                    *scale_args,
+                    # Do not duplicate or drop frames.
+                    "-vsync",
+                    "passthrough",
+                    *_ENCODER_ARGS[fmt],
+                    os.path.join(temp_dir, f"%05d.{extension}"),
+                ]
+            )
+            fnames = sorted(os.listdir(temp_dir))
+            for offset, fname in enumerate(fnames):
+                with open(os.path.join(temp_dir, fname), "rb") as f:
+                    self._cache.put(
+                        (video_file, first + offset, width, height, fmt), f.read()
+                    )
+        if fnames and len(fnames) < count:
+            # The stream ended early, e.g. the metadata was from the container duration.
+            self._decoded_num_frames[video_file] = first + len(fnames)
+            logging.info(f"{video_file} has {first + len(fnames)} frames.")
+        logging.info(
+            f"Decoded frames {first}-{first + len(fnames) - 1} of {video_file}."
+        )
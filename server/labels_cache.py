@@ -0,0 +1,69 @@
+import collections
+import os
+import threading
+
+from . import annotation_types
+
+# Label files to keep parsed. Enough for the videos which annotators are working on,
+# and the next ones which are prefetched.
+_MAX_ENTRIES = 64
+
+# Parsed label files, with the (mtime, size) they were parsed at, least recently used
+# first.
+_cache: collections.OrderedDict[
+    str, tuple[tuple[int, int], annotation_types.AllAnnotationsV2]
+] = collections.OrderedDict()
+_lock = threading.Lock()
+
+
+def file_version(labels_file: str) -> tuple[int, int] | None:
+    """Returns (mtime, size) of the labels file, or None if it does not exist."""
+    if not os.path.exists(labels_file):
+        return None
+    stat = os.stat(labels_file)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _put(
+    labels_file: str,
+    version: tuple[int, int],
+    all_annotations: annotation_types.AllAnnotationsV2,
+) -> None:
+    with _lock:
+        _cache[labels_file] = (version, all_annotations)
+        _cache.move_to_end(labels_file)
+        while len(_cache) > _MAX_ENTRIES:
+            _cache.popitem(last=False)
+
+
+def load(labels_file: str) -> annotation_types.AllAnnotationsV2:
+    """Loads the labels file, parsing it only if it changed since the last load.
+
+    The result is shared, and must not be modified.
+    """
+    version = file_version(labels_file)
+    if version is None:
+        return annotation_types.AllAnnotationsV2(by_user={})
+    with _lock:
+        cached = _cache.get(labels_file)
+        if cached is not None and cached[0] == version:
+            _cache.move_to_end(labels_file)
+            return cached[1]
+
+    all_annotations = annotation_types.AllAnnotationsV2.load(labels_file)
+    _put(labels_file, version, all_annotations)
+    return all_annotations
+
+
+def save(
+    labels_file: str, all_annotations: annotation_types.AllAnnotationsV2
+) -> tuple[int, int]:
+    """Saves the labels file, and keeps the saved annotations in the cache.
+
+    Returns the (mtime, size) of the saved file.
+    """
+    all_annotations.save(labels_file)
+    version = file_version(labels_file)
+    assert version is not None
+    _put(labels_file, version, all_annotations)
+    return version
@@ -0,0 +1,67 @@
+import concurrent.futures
+import logging
+import threading
+
+from . import common_types
+from . import labels_cache
+from . import preprocess_movies
+
+# Number of videos after the current one to warm up.
+_NUM_PREFETCH = 2
+
+
+def _warm(video: common_types.VideoFileInternal) -> None:
+    video_file = video["video_file"]
+    # Keyframes are otherwise probed when the video is opened.
+    _ = preprocess_movies.ProcessedMovie(video_file).keyframes_sec
+    preprocess_movies.repack_video(video_file)
+    labels_cache.load(video["label_file"])
+    logging.info(f"Prefetched {video_file}.")
+
+
+class _Prefetcher:
+    """Warms up the caches for videos in the background, one at a time."""
+
+    # Singleton.
+    def __new__(cls) -> "_Prefetcher":
+        if not hasattr(cls, "_instance"):
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if hasattr(self, "_singleton_initialized"):
+            return
+        self._singleton_initialized = True
+
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        # Videos which are queued or being warmed up.
+        self._pending: set[str] = set()
+        self._lock = threading.Lock()
+
+    def _run(self, video: common_types.VideoFileInternal) -> None:
+        try:
+            _warm(video)
+        except Exception:
+            logging.exception(f"Prefetch failed for {video['video_file']}.")
+        finally:
+            with self._lock:
+                self._pending.discard(video["uid"])
+
+    def enqueue(self, video: common_types.VideoFileInternal) -> None:
+        with self._lock:
+            if video["uid"] in self._pending:
+                return
+            self._pending.add(video["uid"])
+        self._executor.submit(self._run, video)
+
+
+def prefetch_after(
+    videos: dict[str, common_types.VideoFileInternal], video_uid: str
+) -> None:
+    """Warms up the videos which follow video_uid, in the user's list of videos."""
+    uids = list(videos)
+    if video_uid not in uids:
+        return
+    index = uids.index(video_uid)
+    for uid in uids[index + 1 : index + 1 + _NUM_PREFETCH]:
+        _Prefetcher().enqueue(videos[uid])
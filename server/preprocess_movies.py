@@ -1,3 +1,4 @@
+import fractions
 import json
 import logging
 import os
@@ -8,17 +9,40 @@ import subprocess
 import time
 
 import filelock
+import numpy as np
 
+from . import common_types
 
-def _get_video_duration_sec(fname: str) -> float:
-    """Returns the duration of the video in seconds using ffprobe."""
+
+def _probe_num_frames(stream: dict[str, str], fps: float) -> int:
+    """Frames in the video stream, or 0 if unknown.
+
+    Not from the container duration, which may be longer, e.g. if audio runs past the
+    last frame.
+    """
+    nb_frames = stream.get("nb_frames", "N/A")
+    if nb_frames not in ("", "N/A") and int(nb_frames) > 0:
+        return int(nb_frames)
+    duration = stream.get("duration", "N/A")
+    if duration not in ("", "N/A"):
+        return int(float(duration) * fps)
+    return 0
+
+
+def _probe_video_meta(fname: str) -> dict[str, float | int | str]:
+    """Returns duration, fps, resolution, codec and frame count using ffprobe."""
     result = subprocess.run(
         [
             "ffprobe",
             "-v",
             "error",
+            "-select_streams",
+            "v:0",
             "-show_entries",
-            "format=duration",
+            (
+                "format=duration:stream=codec_name,width,height,avg_frame_rate,"
+                "r_frame_rate,nb_frames,duration"
+            ),
             "-of",
             "json",
             fname,
@@ -29,13 +53,95 @@ def _get_video_duration_sec(fname: str) -> float:
     )
     info = json.loads(result.stdout)
     logging.info(f"ffprobe info: {info}")
-    return float(info["format"]["duration"])
+    stream = info["streams"][0]
+    # avg_frame_rate is "0/0" for some containers, fall back to r_frame_rate.
+    fps = 0.0
+    for key in ["avg_frame_rate", "r_frame_rate"]:
+        rate = stream.get(key, "0/0")
+        if not rate.endswith("/0"):
+            fps = float(fractions.Fraction(rate))
+            if fps > 0:
+                break
+    return {
+        "duration_sec": float(info["format"]["duration"]),
+        "fps": fps,
+        "width": int(stream["width"]),
+        "height": int(stream["height"]),
+        "codec": stream["codec_name"],
+        "num_frames": _probe_num_frames(stream, fps),
+    }
+
+
+def _probe_start_sec(fname: str) -> float:
+    """Returns the start time of the first video stream, usually 0."""
+    result = subprocess.run(
+        [
+            "ffprobe",
+            "-v",
+            "error",
+            "-select_streams",
+            "v:0",
+            "-show_entries",
+            "stream=start_time",
+            "-of",
+            "csv=print_section=0",
+            fname,
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    start_time = result.stdout.strip()
+    if start_time in ("", "N/A"):
+        return 0.0
+    return float(start_time)
+
+
+def _probe_keyframes_sec(fname: str) -> np.ndarray:
+    """Returns sorted keyframe timestamps of the first video stream.
+
+    Relative to the start of the stream, as the player's currentTime is. E.g. MPEG-TS
+    streams do not start at 0.
+
+    Only packet headers are read, so this does not decode the video.
+    """
+    start_sec = _probe_start_sec(fname)
+    result = subprocess.run(
+        [
+            "ffprobe",
+            "-v",
+            "error",
+            "-select_streams",
+            "v:0",
+            "-show_entries",
+            "packet=pts_time,flags",
+            "-of",
+            "csv=print_section=0",
+            fname,
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    keyframes: list[float] = []
+    for line in result.stdout.splitlines():
+        pts_time, _, flags = line.partition(",")
+        if "K" in flags and pts_time not in ("", "N/A"):
+            keyframes.append(float(pts_time) - start_sec)
+    return np.unique(np.maximum(np.array(keyframes, dtype=np.float64), 0.0))
 
 
 _PROCESSED_ROOT = "./_persistent_cache"
 
 _THUMBNAIL_SPRITE_FNAME = "thumbnail_sprite.jpg"
 
+_VIDEO_META_FNAME = "video_meta.json"
+# Relative to the stream start. Earlier "keyframes.npy" had raw timestamps.
+_KEYFRAMES_FNAME = "keyframes_sec.npy"
+_REPACKED_FNAME = "repacked.mp4"
+
 # If you change these, reflect it in the ThumbnailPreviews.tsx.
 # Also delete the persistent cache to rebuild.
 _THUMBNAIL_WIDTH = 160
@@ -50,20 +156,92 @@ _INTERVAL_SECS_KEY = "interval_secs"
 _DEFAULT_INTERVAL_SECS = 10
 
 
-# Creates movie sprites (and may be later process the movie for better streaming as well).
+def processed_dir(movie_fname: str) -> str:
+    """Directory under which all processed data for the movie is cached."""
+    return os.path.join(_PROCESSED_ROOT, os.path.basename(movie_fname))
+
+
+def _lockfile(movie_fname: str) -> str:
+    # One lock per video, so that different videos can be processed in parallel.
+    return f"/tmp/video_annotator.thumbnails.{os.path.basename(movie_fname)}.lock"
+
+
+def is_preprocessed(movie_fname: str) -> bool:
+    """True if ProcessedMovie would not need to do any work."""
+    movie_dir = processed_dir(movie_fname)
+    return os.path.exists(
+        os.path.join(movie_dir, _VIDEO_META_FNAME)
+    ) and os.path.exists(os.path.join(movie_dir, _THUMBNAIL_SPRITE_FNAME))
+
+
+def has_keyframes(movie_fname: str) -> bool:
+    """True if the keyframes are probed, i.e. video_meta would not need to wait."""
+    return os.path.exists(os.path.join(processed_dir(movie_fname), _KEYFRAMES_FNAME))
+
+
+def _repacked_fname(movie_fname: str) -> str:
+    # No need to repack .mp4, they are natively supported on browsers.
+    if movie_fname.endswith(".mp4"):
+        return movie_fname
+    return os.path.join(processed_dir(movie_fname), _REPACKED_FNAME)
+
+
+def is_repacked(movie_fname: str) -> bool:
+    return os.path.exists(_repacked_fname(movie_fname))
+
+
+def repack_video(movie_fname: str) -> str:
+    """Returns an mp4 for the movie, remuxing it if necessary."""
+    repacked = _repacked_fname(movie_fname)
+    if os.path.exists(repacked):  # Avoid repacking if already done
+        return repacked
+    with filelock.FileLock(_lockfile(movie_fname)):
+        if not os.path.exists(repacked):
+            logging.info(f"Repacking {movie_fname} to {repacked}")
+            os.makedirs(os.path.dirname(repacked), exist_ok=True)
+            # Write to a temporary name first, so that a partial file is never served.
+            temp_mp4 = repacked + ".tmp.mp4"
+            subprocess.check_call(
+                [
+                    "ffmpeg",
+                    "-y",
+                    "-i",
+                    movie_fname,
+                    "-c",
+                    "copy",
+                    "-movflags",
+                    "+faststart",
+                    temp_mp4,
+                ]
+            )
+            os.rename(temp_mp4, repacked)
+    return repacked
+
+
+def make_temp_dir() -> str:
+    """Makes a randomly named temporary dir, which is cleaned up if abandoned."""
+    temp_dir = os.path.join(
+        _PROCESSED_ROOT,
+        "_temp_" + "".join(random.choices(string.ascii_lowercase, k=10)),
+    )
+    os.makedirs(temp_dir, exist_ok=True)
+    return temp_dir
+
+
+# Creates movie sprites and metadata (and may be later process the movie for better streaming as well).
 class ProcessedMovie:
     def __init__(self, movie_fname: str):
         self._original_fname: str = movie_fname
-        self._processed_dir = os.path.join(
-            _PROCESSED_ROOT, os.path.basename(movie_fname)
-        )
+        self._processed_dir = processed_dir(movie_fname)
 
         self._temp_cleanup()
 
         # Use the lock to avoid flask or gunicorn creating thumbs from each thread.
-        # Use one lock for all videos.
-        lockfile = "/tmp/video_annotator.thumbnails.lock"
-        with filelock.FileLock(lockfile):
+        with filelock.FileLock(_lockfile(movie_fname)):
+            # Metadata first, since the sprites need the duration.
+            if not os.path.exists(self._video_meta_fname):
+                os.makedirs(self._processed_dir, exist_ok=True)
+                self._make_video_meta()
             if not os.path.exists(self.thumbnail_sprite_fname):
                 os.makedirs(self._processed_dir, exist_ok=True)
                 self._make_thumb_sprites()
@@ -97,25 +275,86 @@ class ProcessedMovie:
         with open(self._thumbnail_info_fname, "r") as f:
             return json.load(f)
 
-    def _make_thumb_sprites(self) -> None:
+    @property
+    def _video_meta_fname(self) -> str:
+        return os.path.join(self._processed_dir, _VIDEO_META_FNAME)
+
+    @property
+    def _keyframes_fname(self) -> str:
+        return os.path.join(self._processed_dir, _KEYFRAMES_FNAME)
+
+    @property
+    def keyframes_sec(self) -> np.ndarray:
+        # Made on first use, since it reads every packet of the video.
+        if not os.path.exists(self._keyframes_fname):
+            with filelock.FileLock(_lockfile(self._original_fname)):
+                if not os.path.exists(self._keyframes_fname):
+                    self._make_keyframes()
+        return np.load(self._keyframes_fname)
+
+    @property
+    def probed_meta(self) -> dict[str, float | int | str]:
+        """Duration, fps, resolution, codec and, if known, num_frames.
+
+        Unlike video_meta, never waits.
+        """
+        with open(self._video_meta_fname, "r") as f:
+            return json.load(f)
+
+    @property
+    def video_meta(self) -> common_types.VideoMeta:
+        meta = self.probed_meta
+        return {
+            "duration_sec": float(meta["duration_sec"]),
+            "fps": float(meta["fps"]),
+            "width": int(meta["width"]),
+            "height": int(meta["height"]),
+            "codec": str(meta["codec"]),
+            # Rounded to microseconds, to keep the response compact.
+            "keyframes_sec": np.round(self.keyframes_sec, 6).tolist(),
+        }
+
+    def _check_exists(self) -> None:
         # Show an error if the movie file does not exist.
         if not os.path.exists(self._original_fname):
             raise FileNotFoundError(
                 f"Movie file {self._original_fname} does not exist."
             )
 
-        # Make a randomly named dir under which thumbnails are stored.
-        temp_dir = os.path.join(
-            _PROCESSED_ROOT,
-            "_temp_" + "".join(random.choices(string.ascii_lowercase, k=10)),
+    def _make_video_meta(self) -> None:
+        self._check_exists()
+        logging.info(f"Probing metadata for {self._original_fname}.")
+        meta = _probe_video_meta(self._original_fname)
+        temp_meta = self._video_meta_fname + ".tmp"
+        with open(temp_meta, "w") as f:
+            json.dump(meta, f)
+        os.rename(temp_meta, self._video_meta_fname)
+        logging.info(f"Metadata created for {self._original_fname}.")
+
+    def _make_keyframes(self) -> None:
+        self._check_exists()
+        logging.info(f"Probing keyframes for {self._original_fname}.")
+        keyframes = _probe_keyframes_sec(self._original_fname)
+        os.makedirs(self._processed_dir, exist_ok=True)
+        temp_keyframes = self._keyframes_fname + ".tmp.npy"
+        np.save(temp_keyframes, keyframes)
+        os.rename(temp_keyframes, self._keyframes_fname)
+        logging.info(
+            f"Found {len(keyframes)} keyframes for {self._original_fname}."
         )
+
+    def _make_thumb_sprites(self) -> None:
+        self._check_exists()
+
+        # Make a randomly named dir under which thumbnails are stored.
+        temp_dir = make_temp_dir()
         logging.info(
             f"Creating thumbnails for {self._original_fname} in temporary dir {temp_dir}."
         )
-        os.makedirs(temp_dir, exist_ok=True)
 
         # Determine video duration and optimal interval for 100 thumbnails.
-        duration_sec = _get_video_duration_sec(self._original_fname)
+        with open(self._video_meta_fname, "r") as f:
+            duration_sec = float(json.load(f)["duration_sec"])
         interval_sec = max(duration_sec // _NUM_THUMBNAILS, 1)  # Avoid interval < 1s
 
         # Make thumbnails.
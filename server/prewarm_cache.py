@@ -0,0 +1,139 @@
+"""Builds the processed-media cache offline, so that annotators do not wait for it.
+
+It reads the same config as the server (see ANNOTATION_CONFIG_FILE), and makes the
+metadata, keyframes, thumbnail sprites and repacked mp4 for each video. It is safe to
+run this while the server is running, since both use the same locks and atomic renames.
+
+Usage -
+  python -m server.prewarm_cache [--jobs N] [--renditions] [VIDEO ...]
+
+Where VIDEO selects videos by uid, alias, file name or path. All videos are
+processed if none is given.
+"""
+
+import argparse
+import concurrent.futures
+import logging
+import os
+import sys
+import time
+
+from . import common_types
+from . import config_manager
+from . import preprocess_movies
+from . import renditions
+
+
+def _matches(video: common_types.VideoFileInternal, selectors: list[str]) -> bool:
+    names = {
+        video["uid"],
+        video["video_file"],
+        os.path.basename(video["video_file"]),
+        video.get("video_alias", ""),
+    }
+    return any(selector in names for selector in selectors)
+
+
+def _prewarm(video_file: str, with_renditions: bool) -> bool:
+    """Processes the video. Returns False if everything was already up to date."""
+    did_work = False
+    is_done = preprocess_movies.is_preprocessed(video_file)
+    if not is_done or not preprocess_movies.has_keyframes(video_file):
+        # The server probes keyframes only when a video is opened.
+        _ = preprocess_movies.ProcessedMovie(video_file).keyframes_sec
+        did_work = True
+    if not preprocess_movies.is_repacked(video_file):
+        preprocess_movies.repack_video(video_file)
+        did_work = True
+    if with_renditions and not renditions.all_ready(video_file):
+        # Unlike the server, retries renditions which failed earlier.
+        renditions.make_renditions(video_file, retry_failed=True)
+        did_work = True
+    return did_work
+
+
+def _format_secs(secs: float) -> str:
+    minutes, secs = divmod(int(secs), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--jobs", type=int, default=1, help="Number of videos to process in parallel."
+    )
+    parser.add_argument(
+        "--renditions",
+        action="store_true",
+        help="Also transcode the low-bitrate proxies. This is much slower.",
+    )
+    parser.add_argument(
+        "videos", nargs="*", help="uid, alias, file name or path of videos."
+    )
+    args = parser.parse_args()
+
+    videos = config_manager.read_config()["videos"]
+    if args.videos:
+        videos = [video for video in videos if _matches(video, args.videos)]
+    if not videos:
+        logging.error("No matching videos found in the config.")
+        return 1
+
+    # The same file may be listed more than once, e.g. with different labels.
+    video_files = list(dict.fromkeys(video["video_file"] for video in videos))
+    logging.info(f"Prewarming {len(video_files)} videos with {args.jobs} jobs.")
+
+    start_time = time.time()
+    processed: list[str] = []
+    skipped: list[str] = []
+    failed: list[str] = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        futures = {
+            executor.submit(_prewarm, video_file, args.renditions): video_file
+            for video_file in video_files
+        }
+        for future in concurrent.futures.as_completed(futures):
+            video_file = futures[future]
+            try:
+                if future.result():
+                    processed.append(video_file)
+                    status = "Processed"
+                else:
+                    skipped.append(video_file)
+                    status = "Up to date"
+            except Exception:
+                logging.exception(f"Failed to process {video_file}.")
+                failed.append(video_file)
+                status = "FAILED"
+
+            done = len(processed) + len(skipped) + len(failed)
+            elapsed = time.time() - start_time
+            # Skipped videos are fast, so they are not counted for the estimate.
+            num_slow = len(processed) + len(failed)
+            eta = (
+                elapsed / num_slow * (len(video_files) - done)
+                if num_slow
+                else 0.0
+            )
+            logging.info(
+                f"[{done}/{len(video_files)}] {status}: {video_file}"
+                f" (elapsed {_format_secs(elapsed)}, ETA {_format_secs(eta)})"
+            )
+
+    logging.info(
+        f"Done in {_format_secs(time.time() - start_time)}:"
+        f" {len(processed)} processed, {len(skipped)} up to date, {len(failed)} failed."
+    )
+    for video_file in failed:
+        logging.error(f"Failed: {video_file}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format=r"%(asctime)s:%(levelname)s:%(message)s",
+        datefmt=r"%Y%m%d-%H:%M:%S",
+    )
+    sys.exit(main())
@@ -0,0 +1,266 @@
+import logging
+import os
+import queue
+import shutil
+import subprocess
+import threading
+from typing import Literal, TypedDict
+
+import filelock
+
+from . import preprocess_movies
+
+
+class _RenditionSpec(TypedDict):
+    # Output height. Width is scaled to keep the aspect ratio.
+    height: int
+    # Peak video bitrate, in ffmpeg notation.
+    max_bitrate: str
+
+
+# Lower resolution proxies for annotators on slow connections.
+# Renditions that are not smaller than the source are skipped.
+# If you change these, delete the persistent cache to rebuild.
+_RENDITIONS: dict[str, _RenditionSpec] = {
+    "360p": {"height": 360, "max_bitrate": "800k"},
+    "720p": {"height": 720, "max_bitrate": "2500k"},
+}
+
+# Keyframe interval. Short GOPs make seeking fast, at the cost of a larger file.
+_KEYFRAME_INTERVAL_SEC = 1
+# Duration of each HLS segment.
+_HLS_SEGMENT_SEC = 4
+
+# Encoder threads, and niceness of the encoder. Transcodes run for a long time, and
+# should not starve requests, repacks or frame decoding.
+_TRANSCODE_THREADS = 2
+_TRANSCODE_NICENESS = 10
+
+# Relative to the rendition dir.
+PROXY_MP4_FNAME = "proxy.mp4"
+HLS_DIR = "hls"
+HLS_PLAYLIST_FNAME = "index.m3u8"
+
+
+class RenditionInfo(TypedDict):
+    """Result of api/video/<uid>/renditions for the client."""
+
+    name: str
+    height: int
+    status: Literal["ready", "pending", "failed"]
+
+
+def rendition_dir(video_file: str, name: str) -> str:
+    return os.path.join(preprocess_movies.processed_dir(video_file), f"proxy_{name}")
+
+
+def _failed_marker(video_file: str, name: str) -> str:
+    # Holds the error. Delete it, or run prewarm_cache with --renditions, to retry.
+    return rendition_dir(video_file, name) + ".failed"
+
+
+def has_failed(video_file: str, name: str) -> bool:
+    return os.path.exists(_failed_marker(video_file, name))
+
+
+def is_ready(video_file: str, name: str) -> bool:
+    if name not in _RENDITIONS:
+        return False
+    # The dir is renamed into place only after it is complete.
+    return os.path.isdir(rendition_dir(video_file, name))
+
+
+def _applicable_renditions(video_file: str) -> list[str]:
+    source_height = preprocess_movies.ProcessedMovie(video_file).probed_meta["height"]
+    return [
+        name for name, spec in _RENDITIONS.items() if spec["height"] < source_height
+    ]
+
+
+def _transcode(video_file: str, name: str) -> None:
+    temp_dir = preprocess_movies.make_temp_dir()
+    try:
+        _transcode_to(video_file, name, temp_dir)
+    except BaseException:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+
+
+def _transcode_to(video_file: str, name: str, temp_dir: str) -> None:
+    spec = _RENDITIONS[name]
+    logging.info(f"Transcoding {name} for {video_file} in temporary dir {temp_dir}.")
+    hls_dir = os.path.join(temp_dir, HLS_DIR)
+    os.makedirs(hls_dir)
+
+    # Encode once into fMP4 HLS segments.
+    # Audio is dropped, since the client always plays muted.
+    subprocess.check_call(
+        [
+            "nice",
+            "-n",
+            str(_TRANSCODE_NICENESS),
+            "ffmpeg",
+            "-v",
+            "error",
+            "-i",
+            video_file,
+            "-map",
+            "0:v:0",
+            "-an",
+            "-vf",
+            f"scale=-2:{spec['height']}",
+            "-c:v",
+            "libx264",
+            "-threads",
+            str(_TRANSCODE_THREADS),
+            "-preset",
+            "veryfast",
+            "-crf",
+            "23",
+            "-maxrate",
+            spec["max_bitrate"],
+            "-bufsize",
+            spec["max_bitrate"],
+            "-pix_fmt",
+            "yuv420p",
+            "-force_key_frames",
+            f"expr:gte(t,n_forced*{_KEYFRAME_INTERVAL_SEC})",
+            "-sc_threshold",
+            "0",
+            "-f",
+            "hls",
+            "-hls_time",
+            str(_HLS_SEGMENT_SEC),
+            "-hls_playlist_type",
+            "vod",
+            "-hls_segment_type",
+            "fmp4",
+            "-hls_fmp4_init_filename",
+            "init.mp4",
+            "-hls_segment_filename",
+            os.path.join(hls_dir, "seg_%05d.m4s"),
+            os.path.join(hls_dir, HLS_PLAYLIST_FNAME),
+        ]
+    )
+
+    # Remux the segments into a progressive mp4, for browsers without native HLS.
+    subprocess.check_call(
+        [
+            "ffmpeg",
+            "-v",
+            "error",
+            "-i",
+            os.path.join(hls_dir, HLS_PLAYLIST_FNAME),
+            "-c",
+            "copy",
+            "-movflags",
+            "+faststart",
+            os.path.join(temp_dir, PROXY_MP4_FNAME),
+        ]
+    )
+
+    target_dir = rendition_dir(video_file, name)
+    os.makedirs(os.path.dirname(target_dir), exist_ok=True)
+    os.rename(temp_dir, target_dir)
+    logging.info(f"Transcoded {name} for {video_file}.")
+
+
+def make_renditions(video_file: str, retry_failed: bool = False) -> None:
+    """Synchronously creates all missing renditions for the video.
+
+    Failures are recorded, and not retried unless retry_failed is set, since they are
+    typically due to the source and would fail again.
+    """
+    failed: list[str] = []
+    for name in _applicable_renditions(video_file):
+        # One lock per video, so that different processes do not duplicate work.
+        lockfile = f"/tmp/video_annotator.renditions.{os.path.basename(video_file)}.lock"
+        with filelock.FileLock(lockfile):
+            if is_ready(video_file, name):
+                continue
+            if has_failed(video_file, name) and not retry_failed:
+                continue
+            try:
+                _transcode(video_file, name)
+            except Exception as e:
+                logging.exception(f"Transcoding {name} failed for {video_file}.")
+                with open(_failed_marker(video_file, name), "w") as f:
+                    f.write(f"{e}\n")
+                failed.append(name)
+                continue
+            if has_failed(video_file, name):
+                os.remove(_failed_marker(video_file, name))
+    if failed:
+        raise RuntimeError(f"Transcoding {failed} failed for {video_file}")
+
+
+class _TranscodeQueue:
+    """Transcodes renditions one video at a time, in a background thread."""
+
+    # Singleton.
+    def __new__(cls) -> "_TranscodeQueue":
+        if not hasattr(cls, "_instance"):
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if hasattr(self, "_singleton_initialized"):
+            return
+        self._singleton_initialized = True
+
+        self._queue: queue.Queue[str] = queue.Queue()
+        # Videos which are queued or being transcoded.
+        self._pending: set[str] = set()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def enqueue(self, video_file: str) -> None:
+        with self._lock:
+            if video_file in self._pending:
+                return
+            self._pending.add(video_file)
+        self._queue.put(video_file)
+
+    def run(self):
+        while True:
+            video_file = self._queue.get()
+            try:
+                make_renditions(video_file)
+            except Exception:
+                logging.exception(f"Transcoding failed for {video_file}.")
+            finally:
+                with self._lock:
+                    self._pending.discard(video_file)
+
+
+def all_ready(video_file: str) -> bool:
+    return all(is_ready(video_file, name) for name in _applicable_renditions(video_file))
+
+
+def request_renditions(video_file: str) -> None:
+    """Queues creation of any missing renditions in the background.
+
+    Called when a video is opened. To transcode all videos ahead of time, use
+    prewarm_cache with --renditions.
+    """
+    if all(
+        is_ready(video_file, name) or has_failed(video_file, name)
+        for name in _applicable_renditions(video_file)
+    ):
+        return
+    _TranscodeQueue().enqueue(video_file)
+
+
+def renditions_info(video_file: str) -> list[RenditionInfo]:
+    result: list[RenditionInfo] = []
+    for name in _applicable_renditions(video_file):
+        status: Literal["ready", "pending", "failed"] = "pending"
+        if is_ready(video_file, name):
+            status = "ready"
+        elif has_failed(video_file, name):
+            status = "failed"
+        result.append(
+            {"name": name, "height": _RENDITIONS[name]["height"], "status": status}
+        )
+    return result
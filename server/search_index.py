@@ -0,0 +1,347 @@
+"""Index over the labels of all configured videos, for search across the corpus.
+
+The boxes of every label file are kept in a SQLite table. A label file is re-indexed
+only when its mtime or size changes, so keeping the index in sync costs one stat per
+label file. Label files saved by the server are indexed in the background, from the
+saved annotations.
+"""
+
+import concurrent.futures
+import logging
+import os
+import sqlite3
+import threading
+from typing import Iterable, TypedDict
+
+from . import annotation_types
+from . import config_manager
+
+# Next to the processed media. Safe to delete, it will be rebuilt.
+_INDEX_FILE = "./_persistent_cache/search_index.sqlite3"
+
+# Bump this to rebuild the index on schema change.
+_SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS label_files (
+    label_file TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS boxes (
+    label_file TEXT NOT NULL,
+    workspace TEXT NOT NULL,
+    box_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    start_sec REAL NOT NULL,
+    end_sec REAL NOT NULL,
+    x REAL NOT NULL,
+    y REAL NOT NULL,
+    width REAL NOT NULL,
+    height REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS boxes_by_name ON boxes (workspace, name, start_sec);
+CREATE INDEX IF NOT EXISTS boxes_by_file ON boxes (label_file, workspace);
+"""
+
+# Per connection. Holds the order of the label files to search in.
+_TEMP_SCHEMA = """
+CREATE TEMP TABLE IF NOT EXISTS search_order (
+    label_file TEXT PRIMARY KEY,
+    rank INTEGER NOT NULL
+);
+"""
+
+# (mtime_ns, size) of a label file, when it was indexed.
+_Version = tuple[int, int]
+
+# A row of the boxes table.
+_Row = tuple[str, str, str, str, float, float, float, float, float, float]
+
+
+class _PendingSave(TypedDict):
+    # Version before the first save which is not yet indexed.
+    previous_version: _Version | None
+    # Version and content of the last save.
+    version: _Version
+    all_annotations: annotation_types.AllAnnotationsV2
+    # Workspaces changed since previous_version.
+    workspaces: set[str]
+
+
+def _rows(
+    label_file: str,
+    by_user: Iterable[tuple[str, annotation_types.UserAnnotation]],
+) -> list[_Row]:
+    return [
+        (
+            label_file,
+            workspace,
+            annotation.id,
+            annotation.name,
+            annotation.label.start,
+            annotation.label.end,
+            annotation.label.x,
+            annotation.label.y,
+            annotation.label.width,
+            annotation.label.height,
+        )
+        for workspace, user_annotation in by_user
+        for annotation in user_annotation.annotations
+    ]
+
+
+class SearchIndex:
+    """Only one instance of this class should be used."""
+
+    # Singleton.
+    def __new__(cls) -> "SearchIndex":
+        if not hasattr(cls, "_instance"):
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if hasattr(self, "_singleton_initialized"):
+            return
+        self._singleton_initialized = True
+
+        os.makedirs(os.path.dirname(_INDEX_FILE), exist_ok=True)
+        # Used from request threads and the rescanner, always under the lock.
+        self._db = sqlite3.connect(_INDEX_FILE, check_same_thread=False, timeout=30)
+        self._lock = threading.Lock()
+        with self._lock, self._db:
+            # Lets other processes, e.g. gunicorn workers, read while one writes.
+            self._db.execute("PRAGMA journal_mode=WAL")
+            if self._db.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+                logging.info("Search index schema changed, rebuilding.")
+                self._db.execute("DROP TABLE IF EXISTS label_files")
+                self._db.execute("DROP TABLE IF EXISTS boxes")
+                self._db.execute(f"PRAGMA user_version={_SCHEMA_VERSION}")
+            self._db.executescript(_SCHEMA)
+            self._db.executescript(_TEMP_SCHEMA)
+
+        # Indexes saved label files one at a time, off the request threads.
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        # Saves not yet indexed, and label files being indexed from a save.
+        self._pending_saves: dict[str, _PendingSave] = {}
+        self._indexing_saves: set[str] = set()
+        self._pending_lock = threading.Lock()
+
+    def _indexed_version(self, label_file: str) -> _Version | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT mtime_ns, size FROM label_files WHERE label_file = ?",
+                (label_file,),
+            ).fetchone()
+        return None if row is None else (row[0], row[1])
+
+    def _remove(self, label_file: str) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM boxes WHERE label_file = ?", (label_file,))
+            self._db.execute(
+                "DELETE FROM label_files WHERE label_file = ?", (label_file,)
+            )
+
+    def update(self, label_file: str) -> None:
+        """Re-indexes the label file if it changed since it was last indexed."""
+        with self._pending_lock:
+            if label_file in self._pending_saves or label_file in self._indexing_saves:
+                # Indexed shortly from the saved annotations, no need to read it.
+                return
+        if not os.path.exists(label_file):
+            if self._indexed_version(label_file) is not None:
+                self._remove(label_file)
+            return
+        stat = os.stat(label_file)
+        version = (stat.st_mtime_ns, stat.st_size)
+        if self._indexed_version(label_file) == version:
+            return
+
+        # Parse outside of the lock, this is the slow part.
+        # Not via labels_cache, since only the rows are kept.
+        all_annotations = annotation_types.AllAnnotationsV2.load(label_file)
+        rows = _rows(label_file, all_annotations.by_user.items())
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM boxes WHERE label_file = ?", (label_file,))
+            self._db.executemany(
+                "INSERT INTO boxes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO label_files VALUES (?, ?, ?)",
+                (label_file, *version),
+            )
+        logging.info(f"Indexed {len(rows)} labels from {label_file}.")
+
+    def update_saved(
+        self,
+        label_file: str,
+        previous_version: _Version | None,
+        version: _Version,
+        all_annotations: annotation_types.AllAnnotationsV2,
+        workspace: str,
+    ) -> None:
+        """Queues indexing of a label file which the server just saved.
+
+        The file is not read again. If the index was up to date before the save, only
+        the rows of the saved workspace are replaced.
+        """
+        with self._pending_lock:
+            pending = self._pending_saves.get(label_file)
+            if pending is not None:
+                # Not started yet, so index the latest save instead.
+                pending["version"] = version
+                pending["all_annotations"] = all_annotations
+                pending["workspaces"].add(workspace)
+                return
+            self._pending_saves[label_file] = {
+                "previous_version": previous_version,
+                "version": version,
+                "all_annotations": all_annotations,
+                "workspaces": {workspace},
+            }
+        self._executor.submit(self._index_saved, label_file)
+
+    def _index_saved(self, label_file: str) -> None:
+        with self._pending_lock:
+            pending = self._pending_saves.pop(label_file)
+            self._indexing_saves.add(label_file)
+        try:
+            by_user = pending["all_annotations"].by_user
+            # Else other workspaces may be stale, e.g. if edited outside of the server.
+            workspaces_only = (
+                self._indexed_version(label_file) == pending["previous_version"]
+            )
+            if workspaces_only:
+                rows = _rows(
+                    label_file,
+                    ((w, by_user[w]) for w in pending["workspaces"] if w in by_user),
+                )
+            else:
+                rows = _rows(label_file, by_user.items())
+            with self._lock, self._db:
+                if workspaces_only:
+                    self._db.executemany(
+                        "DELETE FROM boxes WHERE label_file = ? AND workspace = ?",
+                        [(label_file, w) for w in pending["workspaces"]],
+                    )
+                else:
+                    self._db.execute(
+                        "DELETE FROM boxes WHERE label_file = ?", (label_file,)
+                    )
+                self._db.executemany(
+                    "INSERT INTO boxes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+                )
+                self._db.execute(
+                    "INSERT OR REPLACE INTO label_files VALUES (?, ?, ?)",
+                    (label_file, *pending["version"]),
+                )
+            logging.info(f"Indexed {len(rows)} saved labels from {label_file}.")
+        except Exception:
+            # The next sync re-indexes it from the file.
+            logging.exception(f"Could not index saved {label_file}.")
+        finally:
+            with self._pending_lock:
+                self._indexing_saves.discard(label_file)
+
+    def sync(self, label_files: list[str]) -> None:
+        """Brings the index up to date with the label files."""
+        for label_file in label_files:
+            try:
+                self.update(label_file)
+            except Exception:
+                # E.g. a label file with invalid json. Other files are still searchable.
+                logging.exception(f"Could not index {label_file}.")
+
+    def prune(self, label_files: list[str]) -> None:
+        """Drops label files not listed, e.g. if their video is removed from config."""
+        with self._lock:
+            indexed = [
+                row[0] for row in self._db.execute("SELECT label_file FROM label_files")
+            ]
+        for label_file in set(indexed) - set(label_files):
+            self._remove(label_file)
+
+    def search(
+        self,
+        label_files: list[str],
+        workspace: str,
+        name: str | None = None,
+        start_sec: float | None = None,
+        end_sec: float | None = None,
+        min_width: float = 0.0,
+        min_height: float = 0.0,
+        min_area: float = 0.0,
+        limit: int = 100,
+    ) -> list[tuple[str, annotation_types.AnnotationProps]]:
+        """Finds boxes in the label files, for one workspace.
+
+        A box matches the time range if it is visible at any time within the range.
+
+        Returns up to limit (label_file, box) pairs, ordered as in label_files and then
+        by start time.
+        """
+        if not label_files:
+            return []
+        conditions = [
+            "workspace = ?",
+            "width >= ?",
+            "height >= ?",
+            "width * height >= ?",
+        ]
+        params: list[str | float | int] = [
+            workspace,
+            min_width,
+            min_height,
+            min_area,
+        ]
+        if name is not None:
+            conditions.append("name = ?")
+            params.append(name)
+        if start_sec is not None:
+            conditions.append("end_sec >= ?")
+            params.append(start_sec)
+        if end_sec is not None:
+            conditions.append("start_sec <= ?")
+            params.append(end_sec)
+        params.append(limit)
+
+        with self._lock, self._db:
+            # The limit applies in the order of label_files, not alphabetically.
+            self._db.execute("DELETE FROM search_order")
+            self._db.executemany(
+                "INSERT OR IGNORE INTO search_order VALUES (?, ?)",
+                [(label_file, rank) for rank, label_file in enumerate(label_files)],
+            )
+            rows = self._db.execute(
+                "SELECT label_file, box_id, name, start_sec, end_sec, x, y, width, height"
+                " FROM boxes JOIN search_order USING (label_file)"
+                f" WHERE {' AND '.join(conditions)}"
+                " ORDER BY search_order.rank, start_sec LIMIT ?",
+                params,
+            ).fetchall()
+        return [
+            (
+                row[0],
+                annotation_types.AnnotationProps.model_construct(
+                    id=row[1],
+                    name=row[2],
+                    label=annotation_types.BoxLabel.model_construct(
+                        start=row[3],
+                        end=row[4],
+                        x=row[5],
+                        y=row[6],
+                        width=row[7],
+                        height=row[8],
+                    ),
+                ),
+            )
+            for row in rows
+        ]
+
+
+@config_manager.with_config
+def sync_all(config: config_manager.Config) -> None:
+    """Syncs the index with the label files of all configured videos."""
+    label_files = config.get_all_label_files()
+    SearchIndex().sync(label_files)
+    SearchIndex().prune(label_files)
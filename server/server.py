@@ -12,6 +12,7 @@ import flask_socketio
 from . import common_types
 from . import config_manager
 from . import data_endpoints
+from . import search_index
 from . import streaming_endpoints
 
 # Unused functions for flask endpoints.
@@ -23,8 +24,8 @@ _CONFIG_RESCAN_PERIOD = 60
 class _ConfigRescanner:
     """Periodically rescan config, by just loading it.
 
-    This will ensure any new videos are processed for thumbnails, etc., without having
-    to wait for a user query.
+    This will ensure any new videos are processed for thumbnails, etc., and label files
+    are indexed for search, without having to wait for a user query.
     """
 
     def __init__(self) -> None:
@@ -38,6 +39,8 @@ class _ConfigRescanner:
             if time.time() - last_rescan > _CONFIG_RESCAN_PERIOD:
                 last_rescan = time.time()
                 config_manager.reload_config()
+                # Picks up edits to label files made outside of the server.
+                search_index.sync_all()
             time.sleep(1)
 
 
@@ -1,6 +1,8 @@
 import logging
+import math
 import os
 import subprocess
+import typing
 
 import flask
 from flask import jsonify
@@ -8,40 +10,23 @@ from flask import request
 
 from . import common
 from . import config_manager
+from . import frame_extractor
 from . import preprocess_movies
+from . import renditions
 
-# Deleted on exit.
+# Repacked videos used to be stored here. Deleted on exit.
 _TEMP_DIR = "_temp_cache"
 
 
-# Unused functions for flask endpoints.
-# pyright: reportUnusedFunction=false
+_HLS_MIMETYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".mp4": "video/mp4",
+    ".m4s": "video/iso.segment",
+}
 
 
-def _repack_video(video_file: str) -> str:
-    # No need to repack .mp4, they are natively supported on browsers.
-    if video_file.endswith(".mp4"):
-        return video_file
-
-    os.makedirs(_TEMP_DIR, exist_ok=True)
-
-    temp_mp4 = os.path.join(_TEMP_DIR, os.path.basename(video_file) + ".repacked.mp4")
-    if not os.path.exists(temp_mp4):  # Avoid repacking if already done
-        logging.info(f"Repacking {video_file} to {temp_mp4}")
-        subprocess.run(
-            [
-                "ffmpeg",
-                "-y",
-                "-i",
-                video_file,
-                "-c",
-                "copy",
-                "-movflags",
-                "+faststart",
-                temp_mp4,
-            ]
-        )
-    return temp_mp4
+# Unused functions for flask endpoints.
+# pyright: reportUnusedFunction=false
 
 
 def _stream_video(video_path: str, request: flask.Request):
@@ -93,7 +78,7 @@ class VideoStreamer:
         #         preprocess_movies.ProcessedMovie(video_file["video_file"])
         #     )
 
-        def _thumbnail_data(
+        def _processed_movie(
             config: config_manager.Config, video_uid: str
         ) -> preprocess_movies.ProcessedMovie:
             return preprocess_movies.ProcessedMovie(
@@ -116,14 +101,16 @@ class VideoStreamer:
                     404,
                 )
             video_file = video["video_file"]
-            return _stream_video(_repack_video(video_file), request=request)
+            return _stream_video(
+                preprocess_movies.repack_video(video_file), request=request
+            )
 
         @app.route("/api/thumbnail/<string:video_uid>/sprite", methods=["GET"])
         @common.login_required
         @config_manager.with_config
         def get_thumbnail_sprite(config: config_manager.Config, video_uid: str):
             # Serve the thumbnail sprite binary data with correct MIME type
-            sprite_fname = _thumbnail_data(config, video_uid).thumbnail_sprite_fname
+            sprite_fname = _processed_movie(config, video_uid).thumbnail_sprite_fname
             if not os.path.exists(sprite_fname):
                 return (
                     jsonify(
@@ -134,15 +121,137 @@ class VideoStreamer:
                     ),
                     404,
                 )
-            with open(sprite_fname, "rb") as f:
-                data = f.read()
-            return flask.Response(data, mimetype="image/jpeg")
+            # With validators and max-age, so that the client's prefetch is reused.
+            response = flask.send_file(sprite_fname, mimetype="image/jpeg", max_age=3600)
+            # Behind login, so not for shared caches.
+            response.cache_control.public = False
+            response.cache_control.private = True
+            return response
 
         @app.route("/api/thumbnail/<string:video_uid>/info", methods=["GET"])
         @common.login_required
         @config_manager.with_config
         def get_thumbnail_info(config: config_manager.Config, video_uid: str):
-            return jsonify(_thumbnail_data(config, video_uid).thumbnail_info)
+            return jsonify(_processed_movie(config, video_uid).thumbnail_info)
+
+        @app.route("/api/video/<string:video_uid>/meta", methods=["GET"])
+        @common.login_required
+        @config_manager.with_config
+        def get_video_meta(config: config_manager.Config, video_uid: str):
+            # Probed once per video and cached along with the thumbnails.
+            return jsonify(_processed_movie(config, video_uid).video_meta)
+
+        @app.route("/api/video/<string:video_uid>/renditions", methods=["GET"])
+        @common.login_required
+        @config_manager.with_config
+        def get_renditions(config: config_manager.Config, video_uid: str):
+            video_file = config.get_current_user_videos()[video_uid]["video_file"]
+            renditions.request_renditions(video_file)
+            return jsonify({"renditions": renditions.renditions_info(video_file)})
+
+        def _rendition_not_found(video_uid: str, rendition: str):
+            return (
+                jsonify(
+                    {
+                        "status": "error",
+                        "message": f"Rendition {rendition!r} not ready for {video_uid=}",
+                    }
+                ),
+                404,
+            )
+
+        @app.route(
+            "/api/video/<string:video_uid>/proxy/<string:rendition>", methods=["GET"]
+        )
+        @common.login_required
+        @config_manager.with_config
+        def stream_proxy(config: config_manager.Config, video_uid: str, rendition: str):
+            video_file = config.get_current_user_videos()[video_uid]["video_file"]
+            if not renditions.is_ready(video_file, rendition):
+                return _rendition_not_found(video_uid, rendition)
+            proxy_fname = os.path.join(
+                renditions.rendition_dir(video_file, rendition),
+                renditions.PROXY_MP4_FNAME,
+            )
+            return _stream_video(proxy_fname, request=request)
+
+        @app.route(
+            "/api/video/<string:video_uid>/hls/<string:rendition>/<string:fname>",
+            methods=["GET"],
+        )
+        @common.login_required
+        @config_manager.with_config
+        def get_hls_file(
+            config: config_manager.Config, video_uid: str, rendition: str, fname: str
+        ):
+            video_file = config.get_current_user_videos()[video_uid]["video_file"]
+            if not renditions.is_ready(video_file, rendition):
+                return _rendition_not_found(video_uid, rendition)
+            hls_dir = os.path.join(
+                renditions.rendition_dir(video_file, rendition), renditions.HLS_DIR
+            )
+            mimetype = _HLS_MIMETYPES.get(
+                os.path.splitext(fname)[1], "application/octet-stream"
+            )
+            # Rejects any fname outside of hls_dir.
+            return flask.send_from_directory(
+                os.path.abspath(hls_dir), fname, mimetype=mimetype
+            )
+
+        @app.route("/api/frame/<string:video_uid>", methods=["GET"])
+        @common.login_required
+        @config_manager.with_config
+        def get_frame(config: config_manager.Config, video_uid: str):
+            # E.g. /api/frame/<uid>?t=12.5&width=640&format=webp
+            video_file = config.get_current_user_videos()[video_uid]["video_file"]
+            fmt = request.args.get("format", "jpeg")
+            if fmt not in frame_extractor.MIMETYPES:
+                return (
+                    jsonify({"status": "error", "message": f"Unknown {fmt=}"}),
+                    400,
+                )
+            fmt = typing.cast(frame_extractor.FrameFormat, fmt)
+            try:
+                time_sec = float(request.args["t"])
+                # E.g. "nan" and "inf" are parsed by float().
+                if not math.isfinite(time_sec):
+                    raise ValueError(f"Non-finite {time_sec=}")
+                width = int(request.args.get("width", 0))
+                height = int(request.args.get("height", 0))
+            except (KeyError, ValueError):
+                return (
+                    jsonify(
+                        {
+                            "status": "error",
+                            "message": "Expected finite numeric t, and optional width and height",
+                        }
+                    ),
+                    400,
+                )
+
+            extractor = frame_extractor.FrameExtractor()
+            try:
+                frame_index, data = extractor.get_frame(
+                    video_file,
+                    extractor.frame_index(video_file, time_sec),
+                    width,
+                    height,
+                    fmt,
+                )
+            except (subprocess.CalledProcessError, ValueError) as e:
+                # E.g. an ffmpeg without libwebp, or an unknown frame rate.
+                logging.exception(f"Could not extract frame at {time_sec=}.")
+                return (
+                    jsonify(
+                        {"status": "error", "message": f"Could not extract frame: {e}"}
+                    ),
+                    500,
+                )
+            response = flask.Response(data, mimetype=frame_extractor.MIMETYPES[fmt])
+            # Decoded frames never change.
+            response.headers["Cache-Control"] = "private, max-age=86400"
+            response.headers["X-Frame-Index"] = str(frame_index)
+            return response
 
     def __del__(self):
         """Remove temporary files after request."""